@@ -0,0 +1,145 @@
+from monitor import Monitor
+
+import test_cases
+
+import asyncio
+
+from concurrent.futures import Executor
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Optional, Tuple
+
+
+class AsyncMonitor:
+    """
+    asyncio front-end of a monitor, e.g. for events from sockets or queues. Events are collected into micro-batches
+    which are monitored with Monitor.step_many in the executor (by default the thread pool of the event loop), so the
+    event loop is only blocked for the switch interval of the interpreter.
+
+    A batch is monitored as soon as it has max_batch_size events or its first event is max_latency seconds old. At most
+    max_pending_batches batches wait to be monitored; beyond that no further events are read from the source until
+    the verdicts have been consumed, i.e. a slow consumer slows down the source.
+    The monitor must not be used by others while events are monitored.
+    """
+    def __init__(self,
+                 monitor: Monitor,
+                 max_batch_size: int = 1024,
+                 max_latency: float = 0.01,
+                 max_pending_batches: int = 4,
+                 executor: Optional[Executor] = None):
+        assert max_batch_size > 0, "Invalid batch size {}".format(max_batch_size)
+        self.monitor = monitor
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.max_pending_batches = max_pending_batches
+        self.executor = executor
+        self.counters = {'events': 0, 'batches': 0}
+
+    async def verdicts(self, events: AsyncIterable[Tuple[int, str]]) -> AsyncIterator[Tuple[int, int, bool]]:
+        """
+        Monitor an async stream of (timestamp, character) events and yield the verdicts in the order of
+        Monitor.step_many. Errors of the stream are raised once the events before them have been monitored.
+        """
+        loop = asyncio.get_event_loop()
+        batches = asyncio.Queue(self.max_pending_batches)
+        producer = asyncio.ensure_future(self._collect_batches(events, batches))
+        try:
+            while True:
+                batch = await batches.get()
+                if batch is None:
+                    break
+                elif isinstance(batch, Exception):
+                    raise batch
+
+                timestamps, characters = batch
+                verdicts = await loop.run_in_executor(self.executor, self.monitor.step_many, timestamps, characters)
+                self.counters['events'] += len(timestamps)
+                self.counters['batches'] += 1
+
+                for verdict in verdicts:
+                    yield verdict
+        finally:
+            producer.cancel()
+
+    async def feed(self,
+                   events: AsyncIterable[Tuple[int, str]],
+                   sink: Callable[[int, int, bool], None]):
+        """
+        Monitor an async stream of events and pass every resolved verdict to the sink as (timestamp, offset, verdict).
+        """
+        async for timestamp, offset, verdict in self.verdicts(events):
+            sink(timestamp, offset, verdict)
+
+    async def _collect_batches(self, events: AsyncIterable[Tuple[int, str]], batches: asyncio.Queue):
+        loop = asyncio.get_event_loop()
+        iterator = events.__aiter__()
+        timestamps, characters = [], []
+        deadline = None
+
+        # the next event is awaited in a task of its own, so the source is not interrupted when a batch is due
+        next_event = None
+        try:
+            while True:
+                if next_event is None:
+                    next_event = asyncio.ensure_future(iterator.__anext__())
+
+                timeout = None if deadline is None else max(deadline - loop.time(), 0)
+                done, _ = await asyncio.wait((next_event,), timeout=timeout)
+                if done:
+                    try:
+                        timestamp, character = next_event.result()
+                    except StopAsyncIteration:
+                        next_event = None
+                        break
+                    next_event = None
+
+                    if not timestamps:
+                        deadline = loop.time() + self.max_latency
+                    timestamps.append(timestamp)
+                    characters.append(character)
+                    if len(timestamps) < self.max_batch_size:
+                        continue
+
+                await batches.put((timestamps, characters))
+                timestamps, characters = [], []
+                deadline = None
+
+            if timestamps:
+                await batches.put((timestamps, characters))
+        except Exception as exception:
+            await batches.put(exception)
+            return
+        finally:
+            if next_event is not None:
+                next_event.cancel()
+
+        await batches.put(None)
+
+
+async def event_stream(events: Iterable[Tuple[int, str]],
+                       interval: float = 0.0,
+                       burst: int = 1) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Local stream of events which sleeps for interval seconds after every burst of events.
+    """
+    for k, event in enumerate(events, 1):
+        yield event
+        if k % burst == 0:
+            await asyncio.sleep(interval)
+
+
+async def _monitor_pattern():
+    pattern = test_cases.pattern_aaabb()
+    formula = test_cases.until()
+
+    print("Running UNTIL test on formula ({}) and pattern {} ".format(formula, pattern))
+    monitor = AsyncMonitor(Monitor(formula), max_batch_size=2)
+    async for timestamp, offset, verdict in monitor.verdicts(event_stream(pattern, interval=0.001)):
+        print("Verdict at timestamp {}: {}".format(timestamp, "TRUE" if verdict else "FALSE"))
+    print("Monitored {} events in {} batches".format(monitor.counters['events'], monitor.counters['batches']))
+
+
+def main():
+    asyncio.run(_monitor_pattern())
+
+
+if __name__ == '__main__':
+    main()
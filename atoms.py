@@ -0,0 +1,44 @@
+from typing import AbstractSet, Dict, FrozenSet, Iterable, List, Union
+
+# character of an event: a single symbol, a set of atoms which all hold at the event or the bitmask of such a set
+Character = Union[str, AbstractSet[str], int]
+
+# process-wide table of the atoms of multi-proposition events, atom -> bit and bit -> atom
+_bits = {}  # type: Dict[str, int]
+_atoms = []  # type: List[str]
+
+
+def atom_bit(atom: str) -> int:
+    """
+    Bit of an atom in the atom bitmasks, atoms are numbered in the order of their first use.
+    """
+    bit = _bits.get(atom)
+    if bit is None:
+        bit = _bits[atom] = len(_atoms)
+        _atoms.append(atom)
+    return bit
+
+
+def atom_mask(atoms: Iterable[str]) -> int:
+    """
+    Bitmask of a set of atoms, which can be passed as the character of an event instead of the set itself. The bits are
+    only valid in the process which numbered the atoms, sets of atoms can be sent to other processes.
+    """
+    mask = 0
+    for atom in atoms:
+        mask |= 1 << atom_bit(atom)
+    return mask
+
+
+def atom_set(mask: int) -> FrozenSet[str]:
+    """
+    Set of the atoms of a bitmask.
+    """
+    atoms = set()
+    bit = 0
+    while mask:
+        if mask & 1:
+            atoms.add(_atoms[bit])
+        mask >>= 1
+        bit += 1
+    return frozenset(atoms)
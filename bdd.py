@@ -0,0 +1,121 @@
+import boolean_expression as BE
+
+from typing import Dict, Tuple
+
+
+class DecisionBooleanExpression(BE.BooleanExpression):
+    """
+    Node of a reduced ordered binary decision diagram over the variables of the monitor: high if the variable holds,
+    low otherwise. Nodes are interned and built by decision_diagram, so equivalent expressions are the same node.
+    """
+    __slots__ = ('variable', 'high', 'low')
+
+    def __init__(self,
+                 variable: BE.BooleanExpression,
+                 high: BE.BooleanExpression,
+                 low: BE.BooleanExpression):
+        self.variable = variable
+        self.high = high
+        self.low = low
+
+    def __str__(self):
+        return "IF {} THEN {} ELSE {}".format(str(self.variable), str(self.high), str(self.low))
+
+    def substitute(self, previous, delta_t, substitutions=None):
+        if substitutions is not None and self in substitutions:
+            return substitutions[self]
+
+        condition = self.variable.substitute(previous, delta_t, substitutions)
+        high = self.high.substitute(previous, delta_t, substitutions)
+        low = self.low.substitute(previous, delta_t, substitutions)
+        out = BE.ConjunctionBooleanExpression.make(BE.DisjunctionBooleanExpression.make(condition, high),
+                                                   BE.DisjunctionBooleanExpression.make(
+                                                       BE.NegationBooleanExpression.make(condition), low))
+        if substitutions is not None:
+            substitutions[self] = out
+        return out
+
+
+def _variable_order(variable: BE.BooleanExpression) -> Tuple[int, int]:
+    # variables of window mode UNTIL slots are ordered after the plain variable of their slot
+    return variable.var, getattr(variable, 'remaining', -1)
+
+
+def _negate(node: BE.BooleanExpression, diagrams: Dict) -> BE.BooleanExpression:
+    if node is BE.TRUE:
+        return BE.FALSE
+    elif node is BE.FALSE:
+        return BE.TRUE
+
+    key = (None, node)
+    out = diagrams.get(key)
+    if out is None:
+        out = diagrams[key] = DecisionBooleanExpression(node.variable,
+                                                        _negate(node.high, diagrams),
+                                                        _negate(node.low, diagrams))
+    return out
+
+
+def _apply(disjunction: bool,
+           node_1: BE.BooleanExpression,
+           node_2: BE.BooleanExpression,
+           diagrams: Dict) -> BE.BooleanExpression:
+    """
+    Disjunction (or conjunction) of two decision diagrams.
+    """
+    dominant, neutral = (BE.TRUE, BE.FALSE) if disjunction else (BE.FALSE, BE.TRUE)
+    if node_1 is dominant or node_2 is dominant:
+        return dominant
+    elif node_1 is neutral or node_1 is node_2:
+        return node_2
+    elif node_2 is neutral:
+        return node_1
+
+    if node_2._interned_order < node_1._interned_order:
+        node_1, node_2 = node_2, node_1
+    key = (disjunction, node_1, node_2)
+    out = diagrams.get(key)
+    if out is not None:
+        return out
+
+    order_1, order_2 = _variable_order(node_1.variable), _variable_order(node_2.variable)
+    variable = node_1.variable if order_1 <= order_2 else node_2.variable
+    high_1, low_1 = (node_1.high, node_1.low) if order_1 <= order_2 else (node_1, node_1)
+    high_2, low_2 = (node_2.high, node_2.low) if order_2 <= order_1 else (node_2, node_2)
+
+    high = _apply(disjunction, high_1, high_2, diagrams)
+    low = _apply(disjunction, low_1, low_2, diagrams)
+    out = diagrams[key] = high if high is low else DecisionBooleanExpression(variable, high, low)
+    return out
+
+
+def decision_diagram(b_expr: BE.BooleanExpression, diagrams: Dict) -> BE.BooleanExpression:
+    """
+    Decision diagram of a boolean expression, i.e. its canonical form: equivalent expressions have the same diagram.
+    Diagrams of shared sub-expressions are memoized in the diagrams dict, which can be kept across one step.
+    """
+    if b_expr is BE.TRUE or b_expr is BE.FALSE or isinstance(b_expr, DecisionBooleanExpression):
+        return b_expr
+
+    out = diagrams.get(b_expr)
+    if out is not None:
+        return out
+
+    if isinstance(b_expr, BE.VarExpression) or isinstance(b_expr, BE.WindowVarExpression):
+        out = DecisionBooleanExpression(b_expr, BE.TRUE, BE.FALSE)
+    elif isinstance(b_expr, BE.NegVarExpression):
+        out = DecisionBooleanExpression(BE.VarExpression(b_expr.var), BE.FALSE, BE.TRUE)
+    elif isinstance(b_expr, BE.NegationBooleanExpression):
+        out = _negate(decision_diagram(b_expr.formula, diagrams), diagrams)
+    elif isinstance(b_expr, BE.ConjunctionBooleanExpression):
+        # NOTE: Conjunction is the disjunction of its operands
+        out = _apply(True, decision_diagram(b_expr.formula_1, diagrams), decision_diagram(b_expr.formula_2, diagrams),
+                     diagrams)
+    elif isinstance(b_expr, BE.DisjunctionBooleanExpression):
+        out = _apply(False, decision_diagram(b_expr.formula_1, diagrams), decision_diagram(b_expr.formula_2, diagrams),
+                     diagrams)
+    else:
+        raise NotImplementedError("Cannot build the decision diagram of {}".format(b_expr))
+
+    diagrams[b_expr] = out
+    return out
@@ -0,0 +1,685 @@
+import formula as F
+import formula_parser
+from monitor import Monitor
+from async_monitor import AsyncMonitor, event_stream
+from atoms import atom_mask
+from metrics import MonitorMetrics
+from multi_monitor import MultiMonitor
+from parallel_monitor import ParallelMonitor
+from parametric_monitor import ParametricMonitor
+from reorder_buffer import ReorderBuffer
+from compiler import compile_formula
+from trace_file import TraceFile, read_log, write_trace
+from workload import generate_formula
+
+try:
+    from offline import OfflineMonitor
+except ImportError:
+    # the offline engine requires NumPy
+    OfflineMonitor = None
+
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from typing import List, Tuple
+
+
+def random_trace(length: int, alphabet: str = 'ab', seed: int = 0) -> List[Tuple[int, str]]:
+    rng = random.Random(seed)
+    return [(timestamp, rng.choice(alphabet)) for timestamp in range(length)]
+
+
+def until_formula(bound: int) -> F.Formula:
+    return F.Until(formula1=F.Proposition(character='a'),
+                   formula2=F.Proposition(character='b'),
+                   interval=F.Interval(0, bound))
+
+
+def events_per_second(monitor: Monitor, trace: List[Tuple[int, str]]) -> float:
+    monitor._reset()
+    start = time.perf_counter()
+    for timestamp, character in trace:
+        monitor.step(timestamp, character)
+    return len(trace) / (time.perf_counter() - start)
+
+
+def bench_subformula_scaling(bounds=(10, 100, 1000, 3000), trace_length: int = 200):
+    """
+    Events/sec for an UNTIL formula whose interval bound (and therefore the number of sub-formulae N) grows.
+    """
+    trace = random_trace(trace_length)
+
+    print("Sub-formula scaling")
+    print("{:>8} {:>8} {:>12}".format("bound", "N", "events/sec"))
+    for bound in bounds:
+        monitor = Monitor(until_formula(bound))
+        print("{:>8} {:>8} {:>12.1f}".format(bound, monitor.N, events_per_second(monitor, trace)))
+    print("")
+
+
+def bench_pending_verdicts(bound: int = 1000, trace_length: int = 2000, report_every: int = 250):
+    """
+    Per-step latency while thousands of verdicts are pending: every 'a' opens an UNTIL obligation which is only
+    discharged once the interval bound has passed.
+    """
+    monitor = Monitor(until_formula(bound))
+
+    print("Pending verdicts (bound {})".format(bound))
+    print("{:>8} {:>10} {:>12}".format("step", "pending", "us/step"))
+    start = time.perf_counter()
+    for timestamp in range(1, trace_length + 1):
+        monitor.step(timestamp, 'a')
+        if timestamp % report_every == 0:
+            elapsed = time.perf_counter() - start
+            print("{:>8} {:>10} {:>12.1f}".format(timestamp, len(monitor.history), 1e6 * elapsed / report_every))
+            start = time.perf_counter()
+    print("")
+
+
+def bench_replay(chunk_size: int = 1000, trace_length: int = 20000):
+    """
+    Events/sec when replaying a recorded log event by event vs. in chunks of symbol codes.
+    """
+    symbols = ['a', 'b', 'c']
+    trace = random_trace(trace_length, alphabet='abc')
+    timestamps = [timestamp for timestamp, _ in trace]
+    codes = [symbols.index(character) for _, character in trace]
+
+    print("Replay (chunks of {})".format(chunk_size))
+    print("{:>8} {:>12} {:>12}".format("bound", "step", "step_many"))
+    for bound in (1, 10, 100):
+        monitor = Monitor(until_formula(bound))
+        per_event = events_per_second(monitor, trace)
+
+        monitor._reset()
+        start = time.perf_counter()
+        for begin in range(0, trace_length, chunk_size):
+            monitor.step_many(timestamps[begin:begin + chunk_size], codes[begin:begin + chunk_size], symbols)
+        chunked = trace_length / (time.perf_counter() - start)
+
+        print("{:>8} {:>12.1f} {:>12.1f}".format(bound, per_event, chunked))
+    print("")
+
+
+def bench_window_mode(bounds=(10, 100, 1000, 100000), trace_length: int = 200, max_unrolled_bound: int = 1000):
+    """
+    Sub-formulae and events/sec of unrolled intervals vs. window mode for an UNTIL formula with growing interval bound.
+    """
+    trace = random_trace(trace_length)
+
+    print("Window mode")
+    print("{:>8} {:>10} {:>12} {:>10} {:>12}".format("bound", "N", "events/sec", "N window", "events/sec"))
+    for bound in bounds:
+        columns = [bound]
+        if bound <= max_unrolled_bound:
+            monitor = Monitor(until_formula(bound))
+            columns += [monitor.N, events_per_second(monitor, trace)]
+        else:
+            columns += ["-", float("nan")]
+
+        monitor = Monitor(until_formula(bound), window_mode=True)
+        columns += [monitor.N, events_per_second(monitor, trace)]
+        print("{:>8} {:>10} {:>12.1f} {:>10} {:>12.1f}".format(*columns))
+    print("")
+
+
+def bench_propositional(trace_length: int = 50000):
+    """
+    Events/sec of formulae whose propositional parts are evaluated as bitmasks.
+    """
+    a, b, c = (F.Proposition(character=character) for character in 'abc')
+    a_or_not_b = F.Conjunction(formula_1=a, formula_2=F.Negation(formula=b))
+    formulae = [a_or_not_b,
+                F.Previous(formula=a_or_not_b, interval=F.Interval(0, 3)),
+                F.Until(formula1=a_or_not_b, formula2=c, interval=F.Interval(0, 10))]
+    trace = random_trace(trace_length, alphabet='abc')
+
+    print("Propositional formulae")
+    for formula in formulae:
+        print("{:>40} {:>12.1f}".format(str(formula), events_per_second(Monitor(formula), trace)))
+    print("")
+
+
+def bench_large_alphabet(alphabet_size: int = 1000, watched: int = 40, trace_length: int = 20000):
+    """
+    Events/sec of a formula watching some dozens of event types when the events are drawn from a large alphabet,
+    with characters and with symbol codes.
+    """
+    symbols = ["event{}".format(k) for k in range(alphabet_size)]
+    rng = random.Random(0)
+    codes = [rng.randrange(alphabet_size) for _ in range(trace_length)]
+    timestamps = list(range(trace_length))
+    trace = [(timestamp, symbols[code]) for timestamp, code in zip(timestamps, codes)]
+
+    watched_events = F.Proposition(character=symbols[0])
+    for symbol in symbols[1:watched]:
+        watched_events = F.Conjunction(formula_1=watched_events, formula_2=F.Proposition(character=symbol))
+    formula = F.Until(formula1=F.Negation(formula=watched_events),
+                      formula2=F.Proposition(character=symbols[watched]),
+                      interval=F.Interval(0, 5))
+
+    monitor = Monitor(formula)
+    per_event = events_per_second(monitor, trace)
+
+    monitor._reset()
+    start = time.perf_counter()
+    monitor.step_many(timestamps, codes, symbols)
+    chunked = trace_length / (time.perf_counter() - start)
+
+    print("Alphabet of {} symbols, {} watched".format(alphabet_size, watched))
+    print("{:>12} {:>12}".format("step", "step_many"))
+    print("{:>12.1f} {:>12.1f}".format(per_event, chunked))
+    print("")
+
+
+def bench_multi_monitor(properties=(1, 10, 100, 1000), shared: int = 8, trace_length: int = 500):
+    """
+    Sub-formulae and events/sec of many properties built from a small pool of shared sub-formulae, monitored by one
+    monitor per property vs. one MultiMonitor for all properties.
+    """
+    a, b, c = (F.Proposition(character=character) for character in 'abc')
+    pool = [F.Until(formula1=F.Negation(formula=a), formula2=b, interval=F.Interval(0, bound))
+            for bound in range(1, shared // 2 + 1)]
+    pool += [F.Previous(formula=F.Conjunction(formula_1=a, formula_2=c), interval=F.Interval(0, bound))
+             for bound in range(1, shared - len(pool) + 1)]
+    trace = random_trace(trace_length, alphabet='abc')
+    rng = random.Random(0)
+
+    print("Multiple properties ({} shared sub-formulae)".format(len(pool)))
+    print("{:>10} {:>10} {:>12} {:>10} {:>12}".format("properties", "N", "events/sec", "N multi", "events/sec"))
+    for count in properties:
+        formulae = [F.Conjunction(formula_1=rng.choice(pool), formula_2=rng.choice(pool)) for _ in range(count)]
+
+        monitors = [Monitor(formula) for formula in formulae]
+        start = time.perf_counter()
+        for timestamp, character in trace:
+            for monitor in monitors:
+                monitor.step(timestamp, character)
+        separate = trace_length / (time.perf_counter() - start)
+
+        monitor = MultiMonitor(formulae)
+        print("{:>10} {:>10} {:>12.1f} {:>10} {:>12.1f}".format(count, sum(single.N for single in monitors),
+                                                                separate, monitor.N,
+                                                                events_per_second(monitor, trace)))
+    print("")
+
+
+def bench_parametric(keys: int = 20000, events_per_key: int = 4, max_keys: int = 2000):
+    """
+    Events/sec and peak memory of monitoring a formula per key with one Monitor per key vs. a ParametricMonitor,
+    unbounded and with at most max_keys live keys.
+    """
+    rng = random.Random(0)
+    events = [(rng.randrange(keys), timestamp, rng.choice('ab')) for timestamp in range(keys * events_per_key)]
+    formula = until_formula(5)
+
+    def monitor_per_key():
+        monitors = {}
+        for key, timestamp, character in events:
+            monitor = monitors.get(key)
+            if monitor is None:
+                monitor = monitors[key] = Monitor(formula)
+            monitor.step(timestamp, character)
+
+    def parametric(bound):
+        monitor = ParametricMonitor(formula, max_keys=bound)
+        for key, timestamp, character in events:
+            monitor.step(key, timestamp, character)
+
+    print("Parametric monitoring ({} keys, {} events)".format(keys, len(events)))
+    print("{:>24} {:>12} {:>12}".format("", "events/sec", "peak MB"))
+    for name, run in (("monitor per key", monitor_per_key),
+                      ("parametric", lambda: parametric(None)),
+                      ("parametric, {} keys".format(max_keys), lambda: parametric(max_keys))):
+        tracemalloc.start()
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("{:>24} {:>12.1f} {:>12.1f}".format(name, len(events) / elapsed, peak / 2 ** 20))
+    print("")
+
+
+def bench_parallel(traces: int = 400, trace_length: int = 500, keyed_events: int = 200000):
+    """
+    Events/sec of replaying independent traces and of monitoring keyed events on a growing number of processes. Both
+    should scale almost linearly up to the number of cores.
+    """
+    formula = until_formula(10)
+    replay = [random_trace(trace_length, seed=seed) for seed in range(traces)]
+    rng = random.Random(0)
+    events = [(rng.randrange(1000), timestamp, rng.choice('ab')) for timestamp in range(keyed_events)]
+
+    print("Parallel monitoring ({} cores)".format(os.cpu_count()))
+    print("{:>8} {:>12} {:>12}".format("workers", "traces", "keyed"))
+    workers = 1
+    while workers <= max(os.cpu_count() or 1, 2):
+        monitor = ParallelMonitor(formula, max_workers=workers)
+
+        start = time.perf_counter()
+        for _ in monitor.run_traces(replay, chunksize=8):
+            pass
+        traces_per_second = traces * trace_length / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in monitor.iter_verdicts(events):
+            pass
+        keyed_per_second = keyed_events / (time.perf_counter() - start)
+
+        print("{:>8} {:>12.1f} {:>12.1f}".format(workers, traces_per_second, keyed_per_second))
+        workers *= 2
+    print("")
+
+
+def bench_snapshot(bounds=(10, 100, 1000), trace_length: int = 2000, repetitions: int = 20):
+    """
+    Size of snapshots and time of snapshot and restore for an UNTIL formula with growing interval bound, after a trace
+    which leaves a verdict pending for most positions.
+    """
+    print("Snapshot/restore")
+    print("{:>8} {:>8} {:>10} {:>12} {:>12} {:>12}".format("bound", "N", "pending", "bytes", "snapshot ms",
+                                                            "restore ms"))
+    for bound in bounds:
+        monitor = Monitor(until_formula(bound))
+        for timestamp in range(trace_length):
+            monitor.step(timestamp, 'a')
+
+        start = time.perf_counter()
+        for _ in range(repetitions):
+            blob = monitor.snapshot()
+        snapshot_time = (time.perf_counter() - start) / repetitions
+
+        restored = Monitor(until_formula(bound))
+        start = time.perf_counter()
+        for _ in range(repetitions):
+            restored.restore(blob)
+        restore_time = (time.perf_counter() - start) / repetitions
+
+        print("{:>8} {:>8} {:>10} {:>12} {:>12.2f} {:>12.2f}".format(bound, monitor.N, len(monitor.history), len(blob),
+                                                                      1e3 * snapshot_time, 1e3 * restore_time))
+    print("")
+
+
+def bench_ingestion(trace_length: int = 200000, chunk_size: int = 65536):
+    """
+    Events/sec of reading a log from disk, and of reading and monitoring it, for CSV and JSON-lines logs parsed into
+    tuples vs. a memory-mapped binary trace read in chunks.
+    """
+    trace = random_trace(trace_length, alphabet='abc')
+    formula = until_formula(5)
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'trace.csv')
+        with open(csv_path, 'w') as file:
+            file.write("timestamp,symbol\n")
+            for timestamp, character in trace:
+                file.write("{},{}\n".format(timestamp, character))
+
+        jsonl_path = os.path.join(directory, 'trace.jsonl')
+        with open(jsonl_path, 'w') as file:
+            for timestamp, character in trace:
+                file.write(json.dumps({'timestamp': timestamp, 'symbol': character}) + "\n")
+
+        binary_path = os.path.join(directory, 'trace.bin')
+        write_trace(binary_path, trace)
+
+        def read_binary():
+            with TraceFile(binary_path) as trace_file:
+                # touch every event without creating tuples
+                for timestamps, codes in trace_file.chunks(chunk_size):
+                    sum(timestamps)
+                    sum(codes)
+                    timestamps.release()
+                    codes.release()
+
+        def monitor_binary():
+            with TraceFile(binary_path) as trace_file:
+                for _ in trace_file.feed(Monitor(formula), chunk_size):
+                    pass
+
+        print("Ingestion ({} events)".format(trace_length))
+        print("{:>8} {:>12} {:>12}".format("format", "read", "monitor"))
+        for name, read, monitor in (("csv", lambda: list(read_log(csv_path)),
+                                     lambda: Monitor(formula).step_many(*zip(*read_log(csv_path)))),
+                                    ("jsonl", lambda: list(read_log(jsonl_path)),
+                                     lambda: Monitor(formula).step_many(*zip(*read_log(jsonl_path)))),
+                                    ("binary", read_binary, monitor_binary)):
+            columns = [name]
+            for run in (read, monitor):
+                start = time.perf_counter()
+                run()
+                columns.append(trace_length / (time.perf_counter() - start))
+            print("{:>8} {:>12.1f} {:>12.1f}".format(*columns))
+    print("")
+
+
+def bench_async(batch_sizes=(1, 16, 256, 4096), trace_length: int = 50000):
+    """
+    Events/sec of an AsyncMonitor fed from an in-process stream with growing maximum batch size.
+    """
+    trace = random_trace(trace_length)
+
+    async def monitor_stream(batch_size):
+        monitor = AsyncMonitor(Monitor(until_formula(5)), max_batch_size=batch_size)
+        async for _ in monitor.verdicts(event_stream(trace, burst=batch_size)):
+            pass
+        return monitor.counters['batches']
+
+    print("Async monitoring")
+    print("{:>8} {:>10} {:>12}".format("batch", "batches", "events/sec"))
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        batches = asyncio.run(monitor_stream(batch_size))
+        print("{:>8} {:>10} {:>12.1f}".format(batch_size, batches, trace_length / (time.perf_counter() - start)))
+    print("")
+
+
+def bench_incremental(trace_length: int = 20000):
+    """
+    Temporal slots evaluated and skipped per event by the incremental evaluation, for a formula watching two of a
+    growing number of event types.
+    """
+    a, b = F.Proposition(character='a'), F.Proposition(character='b')
+    formula = F.Until(formula1=F.Negation(formula=F.Until(formula1=a, formula2=b, interval=F.Interval(0, 20))),
+                      formula2=b,
+                      interval=F.Interval(0, 20))
+
+    print("Incremental evaluation")
+    print("{:>8} {:>10} {:>10} {:>12}".format("alphabet", "evaluated", "skipped", "events/sec"))
+    for alphabet in ('ab', 'abcd', 'abcdefgh', 'abcdefghijklmnop'):
+        monitor = Monitor(formula)
+        evaluated = skipped = 0
+        start = time.perf_counter()
+        for timestamp, character in random_trace(trace_length, alphabet=alphabet):
+            monitor.step(timestamp, character)
+            evaluated += monitor.evaluated
+            skipped += monitor.skipped
+        elapsed = time.perf_counter() - start
+        print("{:>8} {:>10.1f} {:>10.1f} {:>12.1f}".format(len(alphabet), evaluated / trace_length,
+                                                           skipped / trace_length, trace_length / elapsed))
+    print("")
+
+
+def bench_metrics(trace_length: int = 20000):
+    """
+    Events/sec without metrics, with metrics and with metrics including allocations and expression sizes of every
+    step, followed by the metrics of the last run.
+    """
+    trace = random_trace(trace_length)
+
+    print("Metrics overhead")
+    print("{:>24} {:>12}".format("", "events/sec"))
+    for name, metrics in (("disabled", None),
+                          ("sampled", MonitorMetrics(sample_interval=100)),
+                          ("every step", MonitorMetrics(track_allocations=True))):
+        monitor = Monitor(until_formula(20), metrics=metrics)
+        print("{:>24} {:>12.1f}".format(name, events_per_second(monitor, trace)))
+    print(metrics.summary())
+    print("")
+
+
+def bench_sparse(trace_length: int = 20000, gap: int = 1000):
+    """
+    Events/sec and evaluated slots per event of a sparse stream, whose time distances mostly exceed the intervals, vs. a
+    dense one, and the pending verdicts after every event of the sparse stream with and without a heartbeat at the
+    horizon (or at the next event) after every event.
+    """
+    rng = random.Random(0)
+    dense = random_trace(trace_length, alphabet='abc')
+    sparse = []
+    timestamp = 0
+    for _ in range(trace_length):
+        timestamp += rng.randint(1, gap)
+        sparse.append((timestamp, rng.choice('abc')))
+
+    print("Sparse streams")
+    print("{:>16} {:>12} {:>10} {:>12} {:>12}".format("formula", "stream", "evaluated", "events/sec", "pending"))
+    for name, formula in (("until [0, 20]", until_formula(20)),
+                          ("nested until", F.Until(formula1=F.Negation(formula=until_formula(10)),
+                                                   formula2=F.Proposition(character='c'),
+                                                   interval=F.Interval(0, 50)))):
+        for stream, trace, heartbeats in (("dense", dense, False), ("sparse", sparse, False),
+                                          ("heartbeats", sparse, True)):
+            monitor = Monitor(formula)
+            horizon = monitor.plan.horizon
+            evaluated = pending = 0
+            start = time.perf_counter()
+            for k, (timestamp, character) in enumerate(trace):
+                monitor.step(timestamp, character)
+                evaluated += monitor.evaluated
+                if heartbeats and k + 1 < len(trace):
+                    monitor.advance_time(min(timestamp + horizon + 1, trace[k + 1][0]))
+                    if monitor.advanced_timestamp is not None:
+                        # the slots have been evaluated by the heartbeat
+                        evaluated += monitor.evaluated
+                pending += len(monitor.history)
+            elapsed = time.perf_counter() - start
+            print("{:>16} {:>12} {:>10.1f} {:>12.1f} {:>12.2f}".format(name, stream, evaluated / len(trace),
+                                                                       len(trace) / elapsed, pending / len(trace)))
+    print("")
+
+
+def bench_reorder(trace_length: int = 50000, jitter: int = 20):
+    """
+    Events/sec of monitoring a stream whose events arrive up to jitter time units late, by sorting the whole stream
+    upstream vs. by a reorder buffer with different lateness bounds, with the occupancy of the buffer, the latency it
+    adds and the late events.
+    """
+    rng = random.Random(0)
+    trace = random_trace(trace_length)
+    arrivals = sorted(trace, key=lambda event: event[0] + rng.randint(0, jitter))
+    formula = until_formula(10)
+
+    print("Reorder buffer (jitter {})".format(jitter))
+    print("{:>12} {:>12} {:>10} {:>10} {:>12} {:>8}".format("", "events/sec", "occupancy", "max", "p99 latency",
+                                                             "late"))
+    start = time.perf_counter()
+    for _ in Monitor(formula).iter_verdicts(sorted(arrivals, key=lambda event: event[0])):
+        pass
+    print("{:>12} {:>12.1f}".format("sorted", trace_length / (time.perf_counter() - start)))
+    for lateness in (jitter // 2, jitter, 2 * jitter):
+        reorder_buffer = ReorderBuffer(Monitor(formula), lateness)
+        start = time.perf_counter()
+        for _ in reorder_buffer.iter_verdicts(arrivals):
+            pass
+        elapsed = time.perf_counter() - start
+        occupancy = reorder_buffer.histograms['occupancy']
+        latency = reorder_buffer.histograms['latency_us']
+        print("{:>12} {:>12.1f} {:>10.1f} {:>10} {:>10}us {:>8}".format("lateness {}".format(lateness),
+                                                                      trace_length / elapsed, occupancy.mean(),
+                                                                      occupancy.maximum, latency.quantile(0.99),
+                                                                      reorder_buffer.counters['late']))
+    print("")
+
+
+def bench_memory(monitors: int = 50, trace_length: int = 500):
+    """
+    Memory of monitors which have processed a trace, in bytes per monitor and per slot of the sub-formula array, i.e.
+    the arrays, their values and the pending verdicts (the compiled plan is shared and not counted).
+    """
+    trace = random_trace(trace_length, alphabet='abc')
+    a, b = F.Proposition(character='a'), F.Proposition(character='b')
+    formulae = [("until [0, 10]", until_formula(10)),
+                ("until [0, 100]", until_formula(100)),
+                ("since [0, 100]", F.Since(formula1=a, formula2=b, interval=F.Interval(0, 100))),
+                ("nested until", F.Until(formula1=F.Negation(formula=until_formula(10)),
+                                         formula2=b,
+                                         interval=F.Interval(0, 20)))]
+
+    print("Memory ({} monitors after {} events)".format(monitors, trace_length))
+    print("{:>16} {:>6} {:>12} {:>10}".format("formula", "slots", "bytes", "per slot"))
+    for name, formula in formulae:
+        Monitor(formula)
+        tracemalloc.start()
+        instances = [Monitor(formula) for _ in range(monitors)]
+        for monitor in instances:
+            for timestamp, character in trace:
+                monitor.step(timestamp, character)
+        size = tracemalloc.get_traced_memory()[0] / monitors
+        tracemalloc.stop()
+        print("{:>16} {:>6} {:>12.0f} {:>10.1f}".format(name, instances[0].N, size, size / instances[0].N))
+    print("")
+
+
+def bench_canonical(trace_length: int = 5000):
+    """
+    Maximum pending verdicts, maximum tree size of the pending verdicts and events/sec with canonical forms only and in
+    BDD mode, for formulae whose verdicts contain complementary and duplicate sub-terms.
+    """
+    a, b, c = F.Proposition(character='a'), F.Proposition(character='b'), F.Proposition(character='c')
+    inner = F.Until(formula1=a, formula2=b, interval=F.Interval(0, 5))
+    formulae = [("complement", F.Until(formula1=F.Conjunction(formula_1=inner, formula_2=F.Negation(formula=inner)),
+                                       formula2=c,
+                                       interval=F.Interval(0, 40))),
+                ("nested until", F.Until(formula1=F.Negation(formula=F.Until(formula1=a, formula2=c,
+                                                                             interval=F.Interval(0, 20))),
+                                         formula2=b,
+                                         interval=F.Interval(0, 20))),
+                ("until of untils", F.Until(formula1=F.Until(formula1=a, formula2=b, interval=F.Interval(0, 10)),
+                                            formula2=F.Until(formula1=b, formula2=a, interval=F.Interval(0, 10)),
+                                            interval=F.Interval(0, 30)))]
+    trace = random_trace(trace_length, alphabet='abc')
+
+    print("Canonical verdicts")
+    print("{:>16} {:>6} {:>8} {:>10} {:>12}".format("formula", "mode", "pending", "tree size", "events/sec"))
+    for name, formula in formulae:
+        for mode, bdd_mode in (("", False), ("bdd", True)):
+            metrics = MonitorMetrics()
+            monitor = Monitor(formula, metrics=metrics, bdd_mode=bdd_mode)
+            rate = events_per_second(monitor, trace)
+            print("{:>16} {:>6} {:>8} {:>10} {:>12.1f}".format(name, mode, metrics.histograms['history_size'].maximum,
+                                                               metrics.histograms['tree_size'].maximum, rate))
+    print("")
+
+
+def bench_offline(trace_length: int = 100000):
+    """
+    Events/sec of replaying a recorded trace with the online monitor vs. the offline engine, which evaluates the whole
+    trace at once, reading the trace from a binary trace file.
+    """
+    if OfflineMonitor is None:
+        print("Offline engine: skipped, NumPy is not installed\n")
+        return
+
+    a, b, c = F.Proposition(character='a'), F.Proposition(character='b'), F.Proposition(character='c')
+    # the long SINCE interval is monitored in window mode, which does not unroll it
+    formulae = [("until", until_formula(20), False),
+                ("nested until", F.Until(formula1=F.Negation(formula=until_formula(10)),
+                                         formula2=c,
+                                         interval=F.Interval(2, 50)), False),
+                ("since", F.Since(formula1=a, formula2=b, interval=F.Interval(5, 1000)), True),
+                ("next/previous", F.Conjunction(formula_1=F.Next(formula=a, interval=F.Interval(1, 1)),
+                                                formula_2=F.Previous(formula=c, interval=F.Interval(0, 2))), False)]
+    trace = random_trace(trace_length, alphabet='abc')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'trace.bin')
+        write_trace(path, trace)
+
+        print("Offline engine ({} events)".format(trace_length))
+        print("{:>16} {:>12} {:>12}".format("formula", "online", "offline"))
+        for name, formula, window_mode in formulae:
+            start = time.perf_counter()
+            Monitor(formula, window_mode=window_mode).evaluate(trace)
+            online = trace_length / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            with TraceFile(path) as trace_file:
+                OfflineMonitor(formula).evaluate(trace_file.timestamps, trace_file.codes, trace_file.symbols)
+            offline = trace_length / (time.perf_counter() - start)
+            print("{:>16} {:>12.1f} {:>12.1f}".format(name, online, offline))
+    print("")
+
+
+def bench_startup(formulae: int = 500, depth: int = 4, max_bound: int = 20):
+    """
+    Time to create monitors for several hundred random formula texts: parsing only, monitors from cold caches (parse,
+    compile and arrays) and monitors whose plans are cached by the normalized text.
+    """
+    texts = [formula_parser.format_formula(generate_formula(depth, max_bound, alphabet_size=4, seed=seed))
+             for seed in range(formulae)]
+
+    def clear_caches():
+        for cache in (formula_parser.normalize, formula_parser._parse_normalized, formula_parser.compile_text,
+                      compile_formula):
+            cache.cache_clear()
+
+    def measure(function) -> float:
+        start = time.perf_counter()
+        for text in texts:
+            function(text)
+        return time.perf_counter() - start
+
+    clear_caches()
+    parse = measure(formula_parser.parse)
+    clear_caches()
+    cold = measure(Monitor)
+    cached = measure(Monitor)
+
+    print("Startup ({} formulae, {} distinct, {} slots on average)".format(
+        formulae, len(set(formula_parser.normalize(text) for text in texts)),
+        sum(Monitor(text).N for text in texts) / formulae))
+    print("{:>16} {:>12} {:>14}".format("", "total ms", "us/formula"))
+    for name, duration in (("parse", parse), ("cold monitor", cold), ("cached monitor", cached)):
+        print("{:>16} {:>12.1f} {:>14.1f}".format(name, 1e3 * duration, 1e6 * duration / formulae))
+    print("")
+
+
+def bench_atoms(records: int = 20000, alphabet_size: int = 16, density: float = 0.25):
+    """
+    Records/sec of monitoring event records in which several atoms hold at once, split into one event per atom with the
+    same timestamp vs. one event per record carrying the set of atoms or its bitmask.
+    """
+    rng = random.Random(0)
+    alphabet = [chr(ord('a') + k) for k in range(alphabet_size)]
+    trace = [(timestamp, frozenset(atom for atom in alphabet if rng.random() < density))
+             for timestamp in range(records)]
+    formula = "(a AND NOT b) UNTIL [0, 10] (c OR d) OR e SINCE [0, 20] (f AND PREVIOUS [1, 3] g)"
+    encodings = [("split", [(timestamp, atom) for timestamp, atoms in trace for atom in sorted(atoms)]),
+                 ("sets", trace),
+                 ("bitmasks", [(timestamp, atom_mask(atoms)) for timestamp, atoms in trace])]
+
+    print("Multi-proposition events ({} records, {} atoms, {:.0%} of them per record)".format(records, alphabet_size,
+                                                                                          density))
+    print("{:>16} {:>10} {:>12}".format("encoding", "steps", "records/sec"))
+    for name, events in encodings:
+        monitor = Monitor(formula)
+        start = time.perf_counter()
+        for timestamp, character in events:
+            monitor.step(timestamp, character)
+        print("{:>16} {:>10} {:>12.1f}".format(name, len(events), records / (time.perf_counter() - start)))
+    print("")
+
+
+def main():
+    bench_subformula_scaling()
+    bench_pending_verdicts()
+    bench_replay()
+    bench_window_mode()
+    bench_propositional()
+    bench_large_alphabet()
+    bench_multi_monitor()
+    bench_parametric()
+    bench_parallel()
+    bench_snapshot()
+    bench_ingestion()
+    bench_async()
+    bench_incremental()
+    bench_metrics()
+    bench_sparse()
+    bench_reorder()
+    bench_memory()
+    bench_canonical()
+    bench_offline()
+    bench_startup()
+    bench_atoms()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+from compiler import compile_formula
+from monitor import Monitor
+from workload import OPERATORS, generate_formula, generate_trace
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+from typing import Dict, Iterator, List, Optional
+
+# workload parameters which are varied by the default suite, every other parameter keeps its default
+DEFAULT_WORKLOAD = {'depth': 2, 'max_bound': 5, 'alphabet_size': 4, 'rate': 1.0, 'burstiness': 0.0,
+                    'equal_timestamps': 0.0, 'operators': OPERATORS, 'window_mode': False}
+SUITE = [{},
+         {'depth': 1}, {'depth': 3}, {'depth': 4},
+         {'max_bound': 20}, {'max_bound': 100},
+         {'alphabet_size': 2}, {'alphabet_size': 64},
+         {'rate': 0.2}, {'rate': 0.2, 'burstiness': 0.8},
+         {'equal_timestamps': 0.5},
+         {'operators': ('negation', 'conjunction', 'next', 'until')},
+         {'operators': ('negation', 'conjunction', 'previous', 'since')},
+         {'max_bound': 100, 'window_mode': True}]
+
+
+def workloads(formulae: int, seed: int) -> Iterator[Dict]:
+    """
+    Parameters of every workload of the suite, one per suite entry and formula seed.
+    """
+    for entry in SUITE:
+        name = ",".join("{}={}".format(key, "+".join(value) if key == 'operators' else value)
+                        for key, value in sorted(entry.items())) or "default"
+        for formula_seed in range(seed, seed + formulae):
+            workload = dict(DEFAULT_WORKLOAD, **entry)
+            workload.update(name="{}#{}".format(name, formula_seed), seed=formula_seed)
+            yield workload
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def measure(workload: Dict, trace_length: int) -> Dict:
+    """
+    Construction time, events/sec, per-step latency percentiles and peak memory of a Monitor on a workload.
+    """
+    formula = generate_formula(workload['depth'], workload['max_bound'], workload['alphabet_size'],
+                               workload['operators'], seed=workload['seed'])
+    trace = generate_trace(trace_length, workload['alphabet_size'], workload['rate'], workload['burstiness'],
+                           workload['equal_timestamps'], seed=workload['seed'])
+    result = {'name': workload['name'], 'formula': str(formula)}
+
+    try:
+        compile_formula.cache_clear()
+        start = time.perf_counter()
+        monitor = Monitor(formula, window_mode=workload['window_mode'])
+        result['construction_us'] = 1e6 * (time.perf_counter() - start)
+        start = time.perf_counter()
+        Monitor(formula, window_mode=workload['window_mode'])
+        result['cached_construction_us'] = 1e6 * (time.perf_counter() - start)
+        result['N'] = monitor.N
+
+        latencies = []
+        clock = time.perf_counter
+        for timestamp, character in trace:
+            start = clock()
+            monitor.step(timestamp, character)
+            latencies.append(clock() - start)
+        latencies.sort()
+        result['events_per_second'] = len(trace) / sum(latencies)
+        for q in (0.5, 0.9, 0.99):
+            result['p{}_us'.format(int(100 * q))] = 1e6 * _percentile(latencies, q)
+        result['max_us'] = 1e6 * latencies[-1]
+
+        monitor = Monitor(formula, window_mode=workload['window_mode'])
+        tracemalloc.start()
+        for timestamp, character in trace:
+            monitor.step(timestamp, character)
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+    except NotImplementedError as exception:
+        # operators which the monitor cannot compile are recorded, every other failure is a bug and aborts the suite
+        result['error'] = "{}: {}".format(type(exception).__name__, exception)
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    return result
+
+
+def _revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(trace_length: int = 5000, formulae: int = 3, seed: int = 0) -> Dict:
+    results = []
+    for workload in workloads(formulae, seed):
+        result = measure(workload, trace_length)
+        results.append(result)
+        if 'error' in result:
+            print("{:<60} {}".format(result['name'], result['error']))
+        else:
+            print("{:<60} {:>12.1f} events/sec {:>8.1f} us p99".format(result['name'], result['events_per_second'],
+                                                                        result['p99_us']))
+
+    return {'revision': _revision(),
+            'date': datetime.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'trace_length': trace_length,
+            'formulae': formulae,
+            'seed': seed,
+            'results': results}
+
+
+def compare(baseline: Dict, current: Dict):
+    """
+    Print the ratios of events/sec and p99 latency of the workloads of two suite runs.
+    """
+    baseline_results = {result['name']: result for result in baseline['results']}
+    print("{:<60} {:>12} {:>12}".format("workload", "events/sec", "p99"))
+    for result in current['results']:
+        old = baseline_results.get(result['name'])
+        if old is None or 'error' in old or 'error' in result:
+            continue
+        print("{:<60} {:>11.2f}x {:>11.2f}x".format(result['name'],
+                                                   result['events_per_second'] / old['events_per_second'],
+                                                   result['p99_us'] / old['p99_us']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite on synthetic workloads.")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--compare', help="compare the results with the JSON results of an earlier run")
+    parser.add_argument('--trace-length', type=int, default=5000)
+    parser.add_argument('--formulae', type=int, default=3, help="formulae per workload")
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args()
+
+    results = run_suite(arguments.trace_length, arguments.formulae, arguments.seed)
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump(results, file, indent=1)
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            compare(json.load(file), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,59 +1,113 @@
+from interning import Interned
 
+from operator import attrgetter
+from typing import Dict, List, Optional, Tuple
 
-class BooleanExpression:
+
+class BooleanExpression(Interned):
+    __slots__ = ()
 
     def simplify(self):
         return self
 
-    def __eq__(self, other):
-        if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
-        else:
-            return False
-
-    def __ne__(self, other):
-        return not self.__eq__(other)
-
-    def __hash__(self):
-        h = 0
-        for k,v in self.__dict__.items():
-            h ^= hash((k, v))
-        return h
+    def substitute(self,
+                   previous: List['BooleanExpression'],
+                   delta_t: int,
+                   substitutions: Optional[Dict['BooleanExpression', 'BooleanExpression']] = None) -> 'BooleanExpression':
+        """
+        Replace the variables of the expression by the entries of the previous array, which have been evaluated delta_t
+        after the preceding event. Pending verdicts share sub-trees, so substitutions of compound expressions can be
+        memoized across one step in the substitutions dict.
+        """
+        raise NotImplementedError
 
 
 class FalseBooleanExpression(BooleanExpression):
+    __slots__ = ()
+
     def eval(self):
         return False
 
+    def substitute(self, previous, delta_t, substitutions=None):
+        return self
+
     def __str__(self):
         return "FALSE"
 
 
 class TrueBooleanExpression(BooleanExpression):
+    __slots__ = ()
+
     def eval(self):
         return True
 
+    def substitute(self, previous, delta_t, substitutions=None):
+        return self
+
     def __str__(self):
         return "TRUE"
 
 
+TRUE = TrueBooleanExpression()
+FALSE = FalseBooleanExpression()
+
+
 class VarExpression(BooleanExpression):
+    __slots__ = ('var',)
+
     def __init__(self, var: int):
         self.var = var
 
     def __str__(self):
         return "VAR {}".format(self.var)
 
+    def substitute(self, previous, delta_t, substitutions=None):
+        return previous[self.var]
+
 
 class NegVarExpression(BooleanExpression):
+    __slots__ = ('var',)
+
     def __init__(self, var: int):
         self.var = var
 
     def __str__(self):
         return "NOT VAR {}".format(self.var)
 
+    def substitute(self, previous, delta_t, substitutions=None):
+        return NegationBooleanExpression.make(previous[self.var])
+
+
+class WindowVarExpression(BooleanExpression):
+    """
+    Variable of an UNTIL slot in window mode which stands for the UNTIL with its interval narrowed to [0, remaining].
+    It replaces the variables of the slots with decremented intervals: on substitution, its value is derived from the
+    slots of the two operands and the time that has passed.
+    """
+    __slots__ = ('var', 'var_1', 'var_2', 'remaining')
+
+    def __init__(self, var: int, var_1: int, var_2: int, remaining: int):
+        self.var = var
+        self.var_1 = var_1
+        self.var_2 = var_2
+        self.remaining = remaining
+
+    def __str__(self):
+        return "VAR {} [0-{}]".format(self.var, self.remaining)
+
+    def substitute(self, previous, delta_t, substitutions=None):
+        if 0 <= delta_t <= self.remaining:
+            later = WindowVarExpression(self.var, self.var_1, self.var_2, self.remaining - delta_t)
+        else:
+            later = FALSE
+
+        return ConjunctionBooleanExpression.make(previous[self.var_2],
+                                                 DisjunctionBooleanExpression.make(previous[self.var_1], later))
+
 
 class NegationBooleanExpression(BooleanExpression):
+    __slots__ = ('formula',)
+
     def __init__(self,
                  formula: BooleanExpression):
         self.formula = formula
@@ -62,54 +116,201 @@ class NegationBooleanExpression(BooleanExpression):
         return "NOT {}".format(str(self.formula))
 
     def simplify(self):
-        if isinstance(self.formula, TrueBooleanExpression):
-            return FalseBooleanExpression()
-        elif isinstance(self.formula, FalseBooleanExpression):
-            return TrueBooleanExpression()
-
-        return self
+        return NegationBooleanExpression.make(self.formula.simplify())
+
+    def substitute(self, previous, delta_t, substitutions=None):
+        if substitutions is not None and self in substitutions:
+            return substitutions[self]
+
+        out = NegationBooleanExpression.make(self.formula.substitute(previous, delta_t, substitutions))
+        if substitutions is not None:
+            substitutions[self] = out
+        return out
+
+    @classmethod
+    def make(cls, formula: BooleanExpression) -> BooleanExpression:
+        """
+        Build the simplified expression without creating nodes which would be simplified away.
+        """
+        if formula is TRUE:
+            return FALSE
+        elif formula is FALSE:
+            return TRUE
+
+        # variables are negated by their negated variable, double negations cancel
+        if type(formula) is VarExpression:
+            return NegVarExpression(formula.var)
+        elif type(formula) is NegVarExpression:
+            return VarExpression(formula.var)
+        elif type(formula) is cls:
+            return formula.formula
+
+        return cls(formula)
 
 class ConjunctionBooleanExpression(BooleanExpression):
+    __slots__ = ('formula_1', 'formula_2', 'operands')
+
     def __init__(self,
                  formula_1: BooleanExpression,
                  formula_2: BooleanExpression):
         self.formula_1 = formula_1
         self.formula_2 = formula_2
+        # operands of the flattened chain, see _operands
+        self.operands = None
 
     def __str__(self):
         return "{} OR {}".format(str(self.formula_1),
                                  str(self.formula_2))
 
     def simplify(self):
-        if isinstance(self.formula_1, FalseBooleanExpression):
-            return self.formula_2
-        elif isinstance(self.formula_2, FalseBooleanExpression):
-            return self.formula_1
+        return ConjunctionBooleanExpression.make(self.formula_1.simplify(), self.formula_2.simplify())
 
-        if isinstance(self.formula_1, TrueBooleanExpression) or isinstance(self.formula_2, TrueBooleanExpression):
-            return TrueBooleanExpression()
+    def substitute(self, previous, delta_t, substitutions=None):
+        if substitutions is not None and self in substitutions:
+            return substitutions[self]
 
-        return self
+        out = ConjunctionBooleanExpression.make(self.formula_1.substitute(previous, delta_t, substitutions),
+                                                self.formula_2.substitute(previous, delta_t, substitutions))
+        if substitutions is not None:
+            substitutions[self] = out
+        return out
+
+    @classmethod
+    def make(cls,
+             formula_1: BooleanExpression,
+             formula_2: BooleanExpression) -> BooleanExpression:
+        """
+        Build the simplified expression without creating nodes which would be simplified away.
+        """
+        if formula_1 is FALSE:
+            return formula_2
+        elif formula_2 is FALSE:
+            return formula_1
+
+        if formula_1 is TRUE or formula_2 is TRUE:
+            return TRUE
+
+        return _canonical(cls, DisjunctionBooleanExpression, TRUE, formula_1, formula_2)
 
 
 class DisjunctionBooleanExpression(BooleanExpression):
+    __slots__ = ('formula_1', 'formula_2', 'operands')
+
     def __init__(self,
                  formula_1: BooleanExpression,
                  formula_2: BooleanExpression):
         self.formula_1 = formula_1
         self.formula_2 = formula_2
+        # operands of the flattened chain, see _operands
+        self.operands = None
 
     def __str__(self):
         return "{} AND {}".format(str(self.formula_1),
                                   str(self.formula_2))
 
     def simplify(self):
-        if isinstance(self.formula_1, TrueBooleanExpression):
-            return self.formula_2
-        elif isinstance(self.formula_2, TrueBooleanExpression):
-            return self.formula_1
-
-        if isinstance(self.formula_1, FalseBooleanExpression) or isinstance(self.formula_2, FalseBooleanExpression):
-            return FalseBooleanExpression()
-
-        return self
+        return DisjunctionBooleanExpression.make(self.formula_1.simplify(), self.formula_2.simplify())
+
+    def substitute(self, previous, delta_t, substitutions=None):
+        if substitutions is not None and self in substitutions:
+            return substitutions[self]
+
+        out = DisjunctionBooleanExpression.make(self.formula_1.substitute(previous, delta_t, substitutions),
+                                                self.formula_2.substitute(previous, delta_t, substitutions))
+        if substitutions is not None:
+            substitutions[self] = out
+        return out
+
+    @classmethod
+    def make(cls,
+             formula_1: BooleanExpression,
+             formula_2: BooleanExpression) -> BooleanExpression:
+        """
+        Build the simplified expression without creating nodes which would be simplified away.
+        """
+        if formula_1 is TRUE:
+            return formula_2
+        elif formula_2 is TRUE:
+            return formula_1
+
+        if formula_1 is FALSE or formula_2 is FALSE:
+            return FALSE
+
+        return _canonical(cls, ConjunctionBooleanExpression, FALSE, formula_1, formula_2)
+
+
+_creation_order = attrgetter('_interned_order')
+
+
+def _operands(cls, b_expr: BooleanExpression) -> Tuple[BooleanExpression, ...]:
+    """
+    Operands of the chain of nested cls nodes rooted at b_expr, b_expr itself if it is not a cls node.
+    """
+    if type(b_expr) is not cls:
+        return b_expr,
+
+    operands = b_expr.operands
+    if operands is None:
+        operands = []
+        stack = [b_expr]
+        while stack:
+            node = stack.pop()
+            if type(node) is cls:
+                stack.append(node.formula_2)
+                stack.append(node.formula_1)
+            else:
+                operands.append(node)
+        operands = b_expr.operands = tuple(operands)
+    return operands
+
+
+def _complement(b_expr: BooleanExpression) -> Optional[BooleanExpression]:
+    if type(b_expr) is NegationBooleanExpression:
+        return b_expr.formula
+    elif type(b_expr) is NegVarExpression:
+        return VarExpression(b_expr.var)
+    return None
+
+
+def _canonical(cls,
+               dual,
+               dominant: BooleanExpression,
+               formula_1: BooleanExpression,
+               formula_2: BooleanExpression) -> BooleanExpression:
+    """
+    Canonical form of the associative and commutative operation cls, whose dominant operand is TRUE (OR) or FALSE (AND):
+    1. nested cls operands are flattened and duplicate operands removed,
+    2. operands of the dual operation which contain another operand are absorbed, e.g. x OR (x AND y) is x,
+    3. complementary operands, e.g. x OR NOT x, yield the dominant operand and
+    4. the remaining operands are sorted by their creation and chained to the right.
+    Nodes are interned, so verdicts with the same operands become the same node and merge in the history.
+    """
+    type_1, type_2 = type(formula_1), type(formula_2)
+    if type_1 is not cls and type_2 is not cls and type_1 is not dual and type_2 is not dual:
+        # fast path for two atomic operands
+        if formula_1 is formula_2:
+            return formula_1
+        if _complement(formula_1) is formula_2 or _complement(formula_2) is formula_1:
+            return dominant
+        if formula_2._interned_order < formula_1._interned_order:
+            formula_1, formula_2 = formula_2, formula_1
+        return cls(formula_1, formula_2)
+
+    operands = set(_operands(cls, formula_1))
+    operands.update(_operands(cls, formula_2))
+    for operand in operands:
+        complement = _complement(operand)
+        if complement is not None and complement in operands:
+            return dominant
+
+    absorbed = [operand for operand in operands
+                if type(operand) is dual and not operands.isdisjoint(_operands(dual, operand))]
+    operands.difference_update(absorbed)
+
+    ordered = sorted(operands, key=_creation_order)
+    out = ordered[-1]
+    for operand in reversed(ordered[:-1]):
+        out = cls(operand, out)
+    if type(out) is cls:
+        out.operands = tuple(ordered)
+    return out
@@ -0,0 +1,482 @@
+import formula as F
+import boolean_expression as BE
+import functional_expression as FE
+
+from atoms import atom_bit
+
+from collections import deque
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence, Tuple
+
+# functional expressions are never modified, so the constant ones can be shared between all slots and monitors
+NOW_TRUE = FE.NowFormulaExpression(BE.TRUE)
+NOW_FALSE = FE.NowFormulaExpression(BE.FALSE)
+
+# bound of the propositional bitmasks cached per plan for events with sets of atoms
+ATOM_MASK_CACHE_SIZE = 4096
+
+# bound of the symbol tables whose propositional bitmasks are cached per plan (see Plan.symbol_masks)
+SYMBOL_TABLE_CACHE_SIZE = 64
+
+
+class Plan:
+    """
+    One or more formulae compiled into the array of their sub-formulae and one specialized progress function per slot.
+    Plans are shared between all monitors of the same formulae and must not be modified.
+
+    By default, temporal operators are unrolled into one slot per decremented interval, so the size of the arrays grows
+    with the interval bounds. In window mode every temporal operator keeps a single slot: UNTIL refers to its narrowed
+    intervals through window variables (see BE.WindowVarExpression) and SINCE keeps the timestamps of its window in the
+    monitor, with the pending conditions of future-time operands. Both modes implement the usual MTL semantics of SINCE
+    and report the same verdicts.
+
+    The sub-formulae of every formula are appended to the array in the order of the formulae and roots[i] is the slot of
+    the i-th formula. With deduplication, a sub-formula which is already in the array shares its slot.
+    """
+    def __init__(self,
+                 formulae: Sequence[F.Formula],
+                 window_mode: bool = False,
+                 deduplicate: bool = False):
+        self.formulae = tuple(formulae)
+        self.window_mode = window_mode
+        self.subformulae = []
+        self.formula_index = {}
+        self.children = []
+        self.siblings = []
+        self.roots = []
+
+        slots = {}
+        for formula in self.formulae:
+            self._add_formula(formula, deduplicate, slots)
+
+        self.N = len(self.subformulae)
+        for k, formula in enumerate(self.subformulae):
+            self.formula_index.setdefault(formula, k)
+
+        # largest interval bound: all time distances beyond it evaluate the slots alike (see Monitor._evaluate)
+        self.horizon = max([formula.interval.end for formula in self.subformulae
+                            if not (isinstance(formula, F.Proposition) or isinstance(formula, F.Negation)
+                                    or isinstance(formula, F.Conjunction))], default=0)
+
+        # variables of the siblings of every slot, shared by the expressions of all monitors (see Monitor.snapshot)
+        self.sibling_variables = [tuple(BE.VarExpression(sibling) for sibling in siblings) for siblings in self.siblings]
+        self.sibling_index = {id(variables): k for k, variables in enumerate(self.sibling_variables) if variables}
+
+        self.progressors = [self._compile_progressor(k) for k in range(self.N)]
+        self._compile_propositional_slots()
+
+    def _add_formula(self,
+                     formula: F.Formula,
+                     deduplicate: bool,
+                     slots: dict):
+        """
+        Append the sub-formula array of a formula, its layout maps the indices of its own array to slots of the plan.
+        """
+        subformulae = []
+        self._create_array_recursion_helper(formula, subformulae)
+
+        # reverse the list of sub-formulae as they have been inserted in the reverse order
+        subformulae.reverse()
+
+        children, siblings = self._index_subformulae(subformulae)
+        layout = []
+        for j, subformula in enumerate(subformulae):
+            if deduplicate:
+                key = subformula
+            else:
+                key = (len(self.roots), j)
+
+            slot = slots.get(key)
+            layout.append(len(self.subformulae) if slot is None else slot)
+            if slot is None:
+                slots[key] = len(self.subformulae)
+                self.subformulae.append(subformula)
+                self.children.append(tuple(layout[child] for child in children[j]))
+                self.siblings.append(tuple(layout[sibling] for sibling in siblings[j]))
+
+        self.roots.append(layout[-1])
+
+    def _compile_propositional_slots(self):
+        """
+        Split the slots into propositional ones (propositions and negations/conjunctions of propositional slots), whose
+        values only depend on the character of the event, and the remaining temporal ones. The propositional slots are
+        evaluated at once into a bitmask with bit k set iff the slot k holds, see propositional_mask.
+        """
+        self.propositional_slots = []
+        self.symbol_slots = {}
+        self._propositional_program = []
+        propositional = set()
+        for k, formula in enumerate(self.subformulae):
+            children = self.children[k]
+            if isinstance(formula, F.Proposition):
+                self.symbol_slots.setdefault(formula.character, []).append(k)
+            elif isinstance(formula, F.Negation) and children[0] in propositional:
+                self._propositional_program.append((k, F.Negation, children[0], None))
+            elif isinstance(formula, F.Conjunction) and children[0] in propositional and children[1] in propositional:
+                self._propositional_program.append((k, F.Conjunction, children[0], children[1]))
+            else:
+                continue
+            propositional.add(k)
+            self.propositional_slots.append(k)
+
+        self.temporal_progressors = [(k, progress) for k, progress in enumerate(self.progressors)
+                                     if k not in propositional]
+        self.temporal_dependencies = [self._dependencies(k, progress) for k, progress in self.temporal_progressors]
+
+        # the masks of all symbols of the formula are computed upfront, every other symbol satisfies no proposition
+        self.default_mask = self._evaluate_propositional_program(0)
+        self._masks = {symbol: self._evaluate_propositional_program(sum(1 << k for k in slots))
+                       for symbol, slots in self.symbol_slots.items()}
+
+        # events with sets of atoms: the bit of every symbol of the formula in the atom bitmasks (see atoms), the slots
+        # of its propositions and the bitmasks of the combinations of symbols seen so far
+        self._atom_bits = {symbol: 1 << atom_bit(symbol) for symbol in self.symbol_slots}
+        self._atom_slots = [(self._atom_bits[symbol], sum(1 << k for k in slots))
+                            for symbol, slots in self.symbol_slots.items()]
+        self.atoms_mask = sum(self._atom_bits.values())
+        self._atom_masks = {}
+
+        # symbol tables of chunks of symbol codes -> bitmasks of their symbols
+        self._symbol_masks = {}
+
+    def _dependencies(self,
+                      formula_idx: int,
+                      progress: Callable) -> Tuple[int, Callable, Tuple[int, ...], Optional[Tuple], bool, bool]:
+        """
+        Inputs of the progress function of a temporal slot for incremental evaluation:
+        1. the slots whose current values it reads,
+        2. the slots whose previous values it reads by the time distance, i.e. the x-th one (or None) is read for the
+           time distance x and none is read beyond them (PREVIOUS and SINCE),
+        3. whether it depends on the time distance (PREVIOUS and SINCE) and
+        4. whether it has to be progressed on every event (SINCE in window mode, which keeps its window up to date).
+        """
+        formula = self.subformulae[formula_idx]
+        children = self.children[formula_idx]
+        if isinstance(formula, F.Since) and self.window_mode:
+            return formula_idx, progress, children, None, True, True
+        elif isinstance(formula, F.Since):
+            return formula_idx, progress, children, self.siblings[formula_idx], True, False
+        elif isinstance(formula, F.Previous):
+            begin, end = formula.interval.begin, formula.interval.end
+            previous_inputs = tuple(children[0] if begin <= x else None for x in range(end + 1))
+            return formula_idx, progress, (), previous_inputs, True, False
+        elif isinstance(formula, F.Next):
+            return formula_idx, progress, (), None, False, False
+        return formula_idx, progress, children, None, False, False
+
+    def _evaluate_propositional_program(self, mask: int) -> int:
+        """
+        Extend a bitmask of the propositions which hold by the negations and conjunctions of propositional slots.
+        """
+        for k, operator, operand_1, operand_2 in self._propositional_program:
+            if operator is F.Negation:
+                holds = not mask >> operand_1 & 1
+            else:
+                holds = (mask >> operand_1 | mask >> operand_2) & 1
+            if holds:
+                mask |= 1 << k
+        return mask
+
+    def propositional_mask(self, character) -> int:
+        """
+        Bitmask of the propositional slots which hold for the character of an event. Besides a single symbol, events may
+        carry a set of atoms or its bitmask (see atoms.atom_mask), in which every atom satisfies its propositions.
+        """
+        if isinstance(character, str):
+            return self._masks.get(character, self.default_mask)
+        elif isinstance(character, int):
+            atoms = character & self.atoms_mask
+        else:
+            atoms = 0
+            for atom in character:
+                atoms |= self._atom_bits.get(atom, 0)
+
+        mask = self._atom_masks.get(atoms)
+        if mask is None:
+            slots = 0
+            for bit, atom_slots in self._atom_slots:
+                if atoms & bit:
+                    slots |= atom_slots
+            mask = self._evaluate_propositional_program(slots)
+            if len(self._atom_masks) < ATOM_MASK_CACHE_SIZE:
+                self._atom_masks[atoms] = mask
+        return mask
+
+    def symbol_masks(self, symbols: Sequence[str]) -> List[int]:
+        """
+        Bitmasks of the propositional slots which hold for every symbol of a symbol table, cached by the table.
+        """
+        symbols = tuple(symbols)
+        masks = self._symbol_masks.get(symbols)
+        if masks is None:
+            masks = [self.propositional_mask(symbol) for symbol in symbols]
+            if len(self._symbol_masks) < SYMBOL_TABLE_CACHE_SIZE:
+                self._symbol_masks[symbols] = masks
+        return masks
+
+    def _create_array_recursion_helper(self,
+                                       formula: F.Formula,
+                                       subformulae: List[F.Formula]):
+        subformulae.append(formula)
+
+        # add all possible intervals as sub-formulae to ensure that they are evaluated first
+        if not self.window_mode and (isinstance(formula, F.Until) or isinstance(formula, F.Since)
+                                     or isinstance(formula, F.Next) or isinstance(formula, F.Previous)):
+
+            current_formula = formula
+            while not current_formula.interval.is_empty():
+                current_formula = current_formula.decrement()
+                subformulae.append(current_formula)
+
+        # recursion step: add all sub-formulae to the array
+        if isinstance(formula, F.Negation) or isinstance(formula, F.Next) or isinstance(formula, F.Previous):
+            self._create_array_recursion_helper(formula.formula, subformulae)
+        elif isinstance(formula, F.Until) or isinstance(formula, F.Since) or isinstance(formula, F.Conjunction):
+            self._create_array_recursion_helper(formula.formula1, subformulae)
+            self._create_array_recursion_helper(formula.formula2, subformulae)
+
+    def _index_subformulae(self, subformulae: List[F.Formula]) -> Tuple[List[Tuple[int, ...]], List[Tuple[int, ...]]]:
+        """
+        Compile a sub-formula array into an indexed DAG. Equal sub-formulae resolve to the index of their first
+        occurrence, every index knows the indices of its children and temporal sub-formulae know the indices of their
+        siblings with decremented intervals, i.e. siblings[k][x] is the index of the formula at k with its interval
+        decremented x times.
+        """
+        formula_index = {}
+        for k, formula in enumerate(subformulae):
+            formula_index.setdefault(formula, k)
+
+        children = []
+        siblings = []
+        for k, formula in enumerate(subformulae):
+            if isinstance(formula, F.Negation) or isinstance(formula, F.Next) or isinstance(formula, F.Previous):
+                children.append((formula_index[formula.formula],))
+            elif isinstance(formula, F.Until) or isinstance(formula, F.Since) or isinstance(formula, F.Conjunction):
+                children.append((formula_index[formula.formula1],
+                                 formula_index[formula.formula2]))
+            else:
+                children.append(())
+
+            if not self.window_mode and (isinstance(formula, F.Until) or isinstance(formula, F.Since)
+                                         or isinstance(formula, F.Next) or isinstance(formula, F.Previous)):
+                # the decremented siblings have been inserted right after the formula, i.e. they precede it now
+                siblings.append(tuple(k - x for x in range(formula.interval.end + 1)))
+            else:
+                siblings.append(())
+
+        return children, siblings
+
+    def _compile_progressor(self, formula_idx: int) -> Callable:
+        """
+        Build the progress function (monitor, delta_t, character) -> FunctionalExpression of a slot. All type tests and
+        lookups of children, siblings and interval bounds happen here, once per plan.
+        """
+        formula = self.subformulae[formula_idx]
+        children = self.children[formula_idx]
+
+        if isinstance(formula, F.Proposition):
+            bit = 1 << formula_idx
+
+            def progress_proposition(monitor, delta_t, character):
+                return NOW_TRUE if monitor.plan.propositional_mask(character) & bit else NOW_FALSE
+
+            return progress_proposition
+
+        elif isinstance(formula, F.Negation):
+            child = children[0]
+
+            def progress_negation(monitor, delta_t, character):
+                return FE.NegFunctionalExpression(monitor.current[child])
+
+            return progress_negation
+
+        elif isinstance(formula, F.Conjunction):
+            child_1, child_2 = children
+
+            def progress_conjunction(monitor, delta_t, character):
+                current = monitor.current
+                return FE.ConjunctionFunctionalExpression(current[child_1], current[child_2])
+
+            return progress_conjunction
+
+        begin, end = formula.interval.begin, formula.interval.end
+
+        if isinstance(formula, F.Previous):
+            child = children[0]
+
+            # NOTE: simplified expansion of previous case
+            def progress_previous(monitor, delta_t, character):
+                if begin <= delta_t <= end:
+                    return monitor.substitute_functional_expression(monitor.previous[child])
+                else:
+                    return NOW_FALSE
+
+            return progress_previous
+
+        elif isinstance(formula, F.Next):
+            # the later expression does not depend on the event, so it is built once
+            later = FE.LaterNextExpression(children[0], begin, end)
+
+            def progress_next(monitor, delta_t, character):
+                return later
+
+            return progress_next
+
+        elif isinstance(formula, F.Since) and self.window_mode and _is_past_time(formula):
+            child_1, child_2 = children
+
+            def progress_since(monitor, delta_t, character):
+                # the window holds the timestamps at which formula 2 held since formula 1 last failed, oldest first
+                window = monitor.windows[formula_idx]
+                timestamp = monitor.current_timestamp
+                current = monitor.current
+
+                if current[child_1].eval(delta_t) is not BE.TRUE:
+                    window.clear()
+                if current[child_2].eval(delta_t) is BE.TRUE and (not window or window[-1] != timestamp):
+                    window.append(timestamp)
+
+                while window and timestamp - window[0] > end:
+                    window.popleft()
+
+                return NOW_TRUE if window and timestamp - window[0] >= begin else NOW_FALSE
+
+            return progress_since
+
+        elif isinstance(formula, F.Since) and self.window_mode:
+            child_1, child_2 = children
+
+            def progress_since(monitor, delta_t, character):
+                # with future-time operands, the window holds (timestamp, condition) entries, oldest first: formula 2
+                # held at the timestamp and formula 1 at every later event iff the condition holds. Conditions which
+                # are not resolved yet are substituted with every event like pending verdicts, so the window is only
+                # updated once the values of the operands are known.
+                timestamp = monitor.current_timestamp
+                formula_1 = _resolved(monitor.current[child_1])
+                formula_2 = _resolved(monitor.current[child_2])
+
+                window = deque()
+                if formula_1 is not NOW_FALSE:
+                    for entry_timestamp, condition in monitor.windows[formula_idx]:
+                        if timestamp - entry_timestamp > end:
+                            continue
+                        if condition is not NOW_TRUE:
+                            condition = _resolved(monitor.substitute_functional_expression(condition.eval(delta_t)))
+                            if condition is NOW_FALSE:
+                                continue
+                        if formula_1 is not NOW_TRUE:
+                            condition = formula_1 if condition is NOW_TRUE \
+                                else FE.DisjunctionFunctionalExpression(condition, formula_1)
+                        window.append((entry_timestamp, condition))
+
+                if formula_2 is not NOW_FALSE:
+                    if window and window[-1][0] == timestamp:
+                        condition = window.pop()[1]
+                        if not (condition is NOW_TRUE or formula_2 is NOW_TRUE):
+                            formula_2 = FE.ConjunctionFunctionalExpression(condition, formula_2)
+                        elif condition is NOW_TRUE:
+                            formula_2 = NOW_TRUE
+                    window.append((timestamp, formula_2))
+                monitor.windows[formula_idx] = window
+
+                since = NOW_FALSE
+                for entry_timestamp, condition in window:
+                    if timestamp - entry_timestamp < begin:
+                        break
+                    elif condition is NOW_TRUE:
+                        return NOW_TRUE
+                    since = condition if since is NOW_FALSE else FE.ConjunctionFunctionalExpression(since, condition)
+                return since
+
+            return progress_since
+
+        elif isinstance(formula, F.Since):
+            child_1, child_2 = children
+            siblings = self.siblings[formula_idx]
+
+            def progress_since(monitor, delta_t, character):
+                # formula 2 holds now if the interval contains 0, or formula 1 holds now and the previous event
+                # satisfied the sibling whose interval is decremented by the time distance
+                current = monitor.current
+                since = NOW_FALSE
+                if delta_t <= end:
+                    formula_1 = current[child_1]
+                    b_expr = monitor.previous[siblings[delta_t]]
+                    if formula_1 is not NOW_FALSE and b_expr is not BE.FALSE:
+                        since = formula_1 if b_expr is BE.TRUE else FE.DisjunctionFunctionalExpression(
+                            formula_1, monitor.substitute_functional_expression(b_expr))
+
+                if begin > 0:
+                    return since
+                formula_2 = current[child_2]
+                if since is NOW_FALSE or formula_2 is NOW_TRUE:
+                    return formula_2
+                return since if formula_2 is NOW_FALSE else FE.ConjunctionFunctionalExpression(formula_2, since)
+
+            return progress_since
+
+        elif isinstance(formula, F.Until) and self.window_mode:
+            child_1, child_2 = children
+
+            def progress_until(monitor, delta_t, character):
+                current = monitor.current
+                return FE.ConjunctionFunctionalExpression(current[child_2] if begin == 0 else NOW_FALSE,
+                                                          FE.LaterWindowUntilExpression(current[child_1], formula_idx,
+                                                                                        child_1, child_2, begin, end))
+
+            return progress_until
+
+        elif isinstance(formula, F.Until):
+            child_1, child_2 = children
+            siblings = self.sibling_variables[formula_idx]
+
+            def progress_until(monitor, delta_t, character):
+                current = monitor.current
+                return FE.ConjunctionFunctionalExpression(current[child_2] if begin == 0 else NOW_FALSE,
+                                                          FE.LaterUntilExpression(current[child_1], formula_idx,
+                                                                                  begin, end, siblings))
+
+            return progress_until
+
+        raise NotImplementedError("Cannot compile formula {}".format(formula))
+
+
+def _resolved(f_expr: FE.FunctionalExpression) -> FE.FunctionalExpression:
+    """
+    NOW_TRUE or NOW_FALSE for a functional expression which does not depend on the time distance, else itself.
+    """
+    if f_expr.timed or f_expr is NOW_TRUE or f_expr is NOW_FALSE:
+        return f_expr
+    b_expr = f_expr.eval(0)
+    if b_expr is BE.TRUE:
+        return NOW_TRUE
+    return NOW_FALSE if b_expr is BE.FALSE else f_expr
+
+
+def _is_past_time(formula: F.Formula) -> bool:
+    if isinstance(formula, F.Next) or isinstance(formula, F.Until):
+        return False
+    elif isinstance(formula, F.Negation) or isinstance(formula, F.Previous):
+        return _is_past_time(formula.formula)
+    elif isinstance(formula, F.Since) or isinstance(formula, F.Conjunction):
+        return _is_past_time(formula.formula1) and _is_past_time(formula.formula2)
+    return True
+
+
+@lru_cache(maxsize=256)
+def compile_formula(formula: F.Formula,
+                    window_mode: bool = False) -> Plan:
+    """
+    Compile a formula into a plan. Formulae are interned, so plans are cached by the identity of the formula and
+    creating many monitors for the same formula compiles it only once.
+    """
+    return Plan((formula,), window_mode)
+
+
+@lru_cache(maxsize=256)
+def compile_formulae(formulae: Tuple[F.Formula, ...],
+                     window_mode: bool = False) -> Plan:
+    """
+    Compile several formulae into one plan in which equal sub-formulae share their slots.
+    """
+    return Plan(formulae, window_mode, deduplicate=True)
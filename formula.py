@@ -1,7 +1,9 @@
 import copy
 
+from interning import Interned
 
-class Formula:
+
+class Formula(Interned):
     def eval(self, character):
         raise NotImplementedError
 
@@ -11,30 +13,14 @@ class Formula:
     def __str__(self):
         return ""
 
-    def __eq__(self, other):
-        if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
-        else:
-            return False
-
-    def __ne__(self, other):
-        return not self.__eq__(other)
-
-    def __hash__(self):
-        h = 0
-        for k,v in self.__dict__.items():
-            h ^= hash((k, v))
-        return h
 
-
-class Interval:
+class Interval(Interned):
     def __init__(self, begin: int, end: int):
         self.begin = begin
         self.end = end
 
-    def decrement(self):
-        self.begin = max(0, self.begin - 1)
-        self.end = max(0, self.end - 1)
+    def decrement(self) -> 'Interval':
+        return Interval(max(0, self.begin - 1), max(0, self.end - 1))
 
     def is_empty(self):
         return self.begin == self.end == 0
@@ -45,21 +31,6 @@ class Interval:
     def __str__(self):
         return "[{}-{}]".format(self.begin, self.end)
 
-    def __eq__(self, other):
-        if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
-        else:
-            return False
-
-    def __ne__(self, other):
-        return not self.__eq__(other)
-
-    def __hash__(self):
-        h = 0
-        for k,v in self.__dict__.items():
-            h ^= hash((k, v))
-        return h
-
 
 class Proposition(Formula):
     def __init__(self, character):
@@ -100,6 +71,9 @@ class Previous(Formula):
         return "PREVIOUS {} {}".format(str(self.formula),
                                        str(self.interval))
 
+    def decrement(self) -> 'Previous':
+        return Previous(self.formula, self.interval.decrement())
+
 
 
 class Next(Formula):
@@ -113,6 +87,9 @@ class Next(Formula):
         return "NEXT {} {}".format(str(self.formula),
                                    str(self.interval))
 
+    def decrement(self) -> 'Next':
+        return Next(self.formula, self.interval.decrement())
+
 
 class Since(Formula):
     def __init__(self,
@@ -128,6 +105,9 @@ class Since(Formula):
                                        str(self.interval),
                                        str(self.formula2))
 
+    def decrement(self) -> 'Since':
+        return Since(self.formula1, self.formula2, self.interval.decrement())
+
 
 
 class Until(Formula):
@@ -143,3 +123,6 @@ class Until(Formula):
         return "UNTIL {} {} {}".format(str(self.formula1),
                                        str(self.interval),
                                        str(self.formula2))
+
+    def decrement(self) -> 'Until':
+        return Until(self.formula1, self.formula2, self.interval.decrement())
@@ -0,0 +1,256 @@
+import formula as F
+
+from compiler import Plan
+
+import re
+import sys
+
+from functools import lru_cache
+from typing import List, Tuple
+
+# size of the caches of normalized texts, parsed formulae and plans
+CACHE_SIZE = 1024
+
+KEYWORDS = ('NOT', 'OR', 'AND', 'NEXT', 'PREVIOUS', 'UNTIL', 'SINCE')
+_ALIASES = {'!': 'NOT', '|': 'OR', '&': 'AND'}
+_TOKEN = re.compile(r"""\s*(?:(?P<number>\d+)|(?P<name>[A-Za-z_][A-Za-z0-9_]*)"""
+                    r"""|"(?P<quoted>[^"]*)"|'(?P<single>[^']*)'|(?P<symbol>[\[\](),=!|&-]))""")
+
+
+def _tokenize(text: str) -> List[Tuple[str, str, int]]:
+    """
+    (kind, value, position) tokens of a formula text, kind is one of number, name, keyword, string and symbol.
+    """
+    tokens = []
+    position = 0
+    end = len(text.rstrip())
+    while position < end:
+        match = _TOKEN.match(text, position)
+        if match is None:
+            position = len(text) - len(text[position:].lstrip())
+            raise ValueError("Unexpected character {!r} at position {} of {!r}".format(text[position], position, text))
+        kind = match.lastgroup
+        value = match.group(kind)
+        start = match.start(kind)
+        if kind == 'name' and value in KEYWORDS:
+            kind = 'keyword'
+        elif kind == 'symbol' and value in _ALIASES:
+            kind, value = 'keyword', _ALIASES[value]
+        elif kind == 'quoted' or kind == 'single':
+            kind = 'string'
+        tokens.append((kind, value, start))
+        position = match.end()
+    return tokens
+
+
+def _quote(character: str) -> str:
+    if re.match(r"[A-Za-z_][A-Za-z0-9_]*\Z", character) and character not in KEYWORDS:
+        return character
+    return "'{}'".format(character) if '"' in character else '"{}"'.format(character)
+
+
+def _matches(tokens: List[Tuple[str, str, int]], position: int, *patterns: Tuple[str, ...]) -> bool:
+    """
+    Whether the tokens from the position on match the patterns, which are the kinds of tokens or the symbols allowed
+    at every position.
+    """
+    if position + len(patterns) > len(tokens):
+        return False
+    for (kind, value, _), pattern in zip(tokens[position:], patterns):
+        if kind not in pattern and not (kind == 'symbol' and value in pattern):
+            return False
+    return True
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize(text: str) -> str:
+    """
+    Normalized text of a formula, which is the cache key of its plan: tokens are separated by single spaces, symbols
+    replaced by keywords, propositions x=a reduced to a and intervals written as [b, e]. Malformed propositions and
+    intervals are kept as they are, so that the parser rejects them.
+    """
+    tokens = _tokenize(text)
+    out = []
+    k = 0
+    while k < len(tokens):
+        kind, value, _ = tokens[k]
+        if kind == 'name' and _matches(tokens, k + 1, ('=',), ('name', 'number', 'string')):
+            # proposition x=a
+            out.append(_quote(tokens[k + 2][1]))
+            k += 3
+            continue
+        elif kind == 'symbol' and value == '[' and _matches(tokens, k + 1, ('number',), (',', '-'), ('number',),
+                                                              (']',)):
+            out.append("[{}, {}]".format(tokens[k + 1][1], tokens[k + 3][1]))
+            k += 5
+            continue
+        out.append(_quote(value) if kind == 'string' or kind == 'name' else value)
+        k += 1
+    return " ".join(out)
+
+
+class _Parser:
+    """
+    Recursive descent parser of the grammar, from the weakest to the strongest binding operator:
+
+        formula  := and ('OR' and)*
+        and      := temporal ('AND' temporal)*
+        temporal := unary (('UNTIL' | 'SINCE') interval temporal)?
+        unary    := 'NOT' unary | ('NEXT' | 'PREVIOUS') interval unary | '(' formula ')' | proposition
+        interval := '[' number (',' | '-') number ']'
+        proposition := name | string | name '=' (name | number | string)
+
+    a AND b is expanded to NOT (NOT a OR NOT b), since the formulae only have disjunctions and negations.
+    """
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def parse(self) -> F.Formula:
+        formula = self.disjunction()
+        if self.position < len(self.tokens):
+            self.error("Unexpected {!r}".format(self.tokens[self.position][1]))
+        return formula
+
+    def error(self, message: str):
+        position = self.tokens[self.position][2] if self.position < len(self.tokens) else len(self.text)
+        raise ValueError("{} at position {} of {!r}".format(message, position, self.text))
+
+    def peek(self, value: str) -> bool:
+        return self.position < len(self.tokens) and self.tokens[self.position][1] == value \
+            and self.tokens[self.position][0] in ('keyword', 'symbol')
+
+    def expect(self, *kinds: str) -> str:
+        if self.position >= len(self.tokens) or self.tokens[self.position][0] not in kinds:
+            self.error("Expected {}".format(" or ".join(kinds)))
+        self.position += 1
+        return self.tokens[self.position - 1][1]
+
+    def accept(self, value: str) -> bool:
+        if self.peek(value):
+            self.position += 1
+            return True
+        return False
+
+    def disjunction(self) -> F.Formula:
+        formula = self.conjunction()
+        while self.accept('OR'):
+            formula = F.Conjunction(formula_1=formula, formula_2=self.conjunction())
+        return formula
+
+    def conjunction(self) -> F.Formula:
+        formula = self.temporal()
+        while self.accept('AND'):
+            other = self.temporal()
+            formula = F.Negation(formula=F.Conjunction(formula_1=F.Negation(formula=formula),
+                                                       formula_2=F.Negation(formula=other)))
+        return formula
+
+    def temporal(self) -> F.Formula:
+        formula = self.unary()
+        if self.accept('UNTIL'):
+            interval = self.interval()
+            return F.Until(formula1=formula, formula2=self.temporal(), interval=interval)
+        elif self.accept('SINCE'):
+            interval = self.interval()
+            return F.Since(formula1=formula, formula2=self.temporal(), interval=interval)
+        return formula
+
+    def unary(self) -> F.Formula:
+        if self.accept('NOT'):
+            return F.Negation(formula=self.unary())
+        elif self.accept('NEXT'):
+            interval = self.interval()
+            return F.Next(formula=self.unary(), interval=interval)
+        elif self.accept('PREVIOUS'):
+            interval = self.interval()
+            return F.Previous(formula=self.unary(), interval=interval)
+        elif self.accept('('):
+            formula = self.disjunction()
+            if not self.accept(')'):
+                self.error("Expected ')'")
+            return formula
+
+        character = self.expect('name', 'string')
+        if self.accept('='):
+            character = self.expect('name', 'number', 'string')
+        return F.Proposition(character=character)
+
+    def interval(self) -> F.Interval:
+        if not self.accept('['):
+            self.error("Expected an interval")
+        begin = int(self.expect('number'))
+        if not (self.accept(',') or self.accept('-')):
+            self.error("Expected ','")
+        end = int(self.expect('number'))
+        if not self.accept(']'):
+            self.error("Expected ']'")
+        if begin > end:
+            self.error("Empty interval [{}, {}]".format(begin, end))
+        return F.Interval(begin, end)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_normalized(text: str) -> F.Formula:
+    return _Parser(text).parse()
+
+
+def parse(text: str) -> F.Formula:
+    """
+    Parse a formula from its text, e.g. "NOT a UNTIL [0, 5] (b OR PREVIOUS [1, 1] c)" (see _Parser for the grammar).
+    Keywords are upper case, propositions are names or quoted strings. Formulae are cached by their normalized text.
+    Errors are reported with their position in the given text.
+    """
+    try:
+        return _parse_normalized(normalize(text))
+    except ValueError:
+        _Parser(text).parse()
+        raise
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_text(text: str, window_mode: bool = False) -> Plan:
+    """
+    Compile the formula of a normalized text into a plan. Plans are cached process-wide by the normalized text, so
+    monitors of known formula texts are created without parsing or compiling (see Monitor).
+    """
+    return Plan((_parse_normalized(text),), window_mode)
+
+
+def format_formula(formula: F.Formula) -> str:
+    """
+    Text of a formula in the syntax of parse, with parentheses around every operand which is not a proposition.
+    """
+    def operand(subformula: F.Formula) -> str:
+        text = format_formula(subformula)
+        return text if isinstance(subformula, F.Proposition) else "({})".format(text)
+
+    if isinstance(formula, F.Proposition):
+        return _quote(str(formula.character))
+    elif isinstance(formula, F.Negation):
+        return "NOT {}".format(operand(formula.formula))
+    elif isinstance(formula, F.Conjunction):
+        return "{} OR {}".format(operand(formula.formula1), operand(formula.formula2))
+
+    interval = "[{}, {}]".format(formula.interval.begin, formula.interval.end)
+    if isinstance(formula, F.Next):
+        return "NEXT {} {}".format(interval, operand(formula.formula))
+    elif isinstance(formula, F.Previous):
+        return "PREVIOUS {} {}".format(interval, operand(formula.formula))
+    elif isinstance(formula, F.Until):
+        return "{} UNTIL {} {}".format(operand(formula.formula1), interval, operand(formula.formula2))
+    elif isinstance(formula, F.Since):
+        return "{} SINCE {} {}".format(operand(formula.formula1), interval, operand(formula.formula2))
+    raise NotImplementedError("Cannot format formula {}".format(formula))
+
+
+def main():
+    for text in sys.argv[1:] or ["a UNTIL [0, 1] b", "NOT x=a SINCE [0, 3] (x=b OR PREVIOUS [1, 1] x=c)"]:
+        formula = parse(text)
+        print("{}\n  normalized: {}\n  formula: {}\n  formatted: {}".format(text, normalize(text), formula,
+                                                                            format_formula(formula)))
+
+
+if __name__ == '__main__':
+    main()
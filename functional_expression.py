@@ -1,56 +1,231 @@
+import boolean_expression as BE
+
 from boolean_expression import BooleanExpression
 
+from typing import Optional, Tuple
+
 
 class FunctionalExpression:
-    pass
+    __slots__ = ()
+
+    # whether the value depends on the time distance, i.e. whether the expression contains a LATER expression
+    timed = False
+
+    def eval(self, delta_t: int) -> BooleanExpression:
+        raise NotImplementedError
+
+    def eval_beyond(self, delta_t: int) -> Optional[BooleanExpression]:
+        """
+        Value for every time distance from delta_t on, or None if the value depends on the time distance.
+        """
+        raise NotImplementedError
 
 
 class NowFormulaExpression(FunctionalExpression):
+    __slots__ = ('bool_expr',)
+
     def __init__(self,
                  boolean_expr: BooleanExpression):
         self.bool_expr = boolean_expr
 
+    def __reduce__(self):
+        return self.__class__, (self.bool_expr,)
+
     def __str__(self):
         return "NOW {}".format(str(self.bool_expr))
 
+    def eval(self, delta_t: int) -> BooleanExpression:
+        return self.bool_expr
+
+    def eval_beyond(self, delta_t: int) -> Optional[BooleanExpression]:
+        return self.bool_expr
+
 
 class LaterFormulaExpression(FunctionalExpression):
+    """
+    Value of a future-time operator which is only known at the next event, as a function of the time distance to it.
+    The function is stored as data, i.e. the operator (the subclass), the slot of the operator and the interval in which
+    the time distance has to lie, so that the states of monitors can be serialized.
+    """
+    __slots__ = ('slot', 'begin', 'end')
+
+    timed = True
+
     def __init__(self,
-                 boolean_expr):  # lambda function int -> bool
-        self.bool_expr = boolean_expr
+                 slot: int,
+                 begin: int,
+                 end: int):
+        self.slot = slot
+        self.begin = begin
+        self.end = end
 
     def __str__(self):
-        return "LATER t -> {}".format(self.bool_expr(0))
+        return "LATER t -> {}".format(self.eval(0))
+
+    def eval_beyond(self, delta_t: int) -> Optional[BooleanExpression]:
+        # every operator is false for time distances beyond its interval
+        return BE.FALSE if delta_t > self.end else None
+
+
+class LaterNextExpression(LaterFormulaExpression):
+    """
+    NEXT with its operand at slot: the next value of the operand if the time distance lies inside the interval.
+    """
+    __slots__ = ('var',)
+
+    def __init__(self,
+                 slot: int,
+                 begin: int,
+                 end: int):
+        super().__init__(slot, begin, end)
+        self.var = BE.VarExpression(slot)
+
+    def __reduce__(self):
+        return self.__class__, (self.slot, self.begin, self.end)
+
+    def eval(self, delta_t: int) -> BooleanExpression:
+        return self.var if self.begin <= delta_t <= self.end else BE.FALSE
+
+
+class LaterUntilExpression(LaterFormulaExpression):
+    """
+    Unrolled UNTIL at slot: the current value of the first operand and the next value of the sibling whose interval is
+    decremented by the time distance, if it lies inside the interval. siblings[x] is the variable of that sibling.
+    """
+    __slots__ = ('formula', 'siblings')
+
+    def __init__(self,
+                 formula: FunctionalExpression,
+                 slot: int,
+                 begin: int,
+                 end: int,
+                 siblings: Tuple[BE.VarExpression, ...]):
+        super().__init__(slot, begin, end)
+        self.formula = formula
+        self.siblings = siblings
+
+    def __reduce__(self):
+        return self.__class__, (self.formula, self.slot, self.begin, self.end, self.siblings)
+
+    def eval(self, delta_t: int) -> BooleanExpression:
+        return BE.DisjunctionBooleanExpression.make(self.formula.eval(delta_t),
+                                                    self.siblings[delta_t] if self.begin <= delta_t <= self.end
+                                                    else BE.FALSE)
+
+
+class LaterWindowUntilExpression(LaterFormulaExpression):
+    """
+    UNTIL at slot in window mode with operands at slot_1 and slot_2: the current value of the first operand and the
+    window variable of the interval narrowed by the time distance, if it lies inside the interval.
+    """
+    __slots__ = ('formula', 'slot_1', 'slot_2')
+
+    def __init__(self,
+                 formula: FunctionalExpression,
+                 slot: int,
+                 slot_1: int,
+                 slot_2: int,
+                 begin: int,
+                 end: int):
+        super().__init__(slot, begin, end)
+        self.formula = formula
+        self.slot_1 = slot_1
+        self.slot_2 = slot_2
+
+    def __reduce__(self):
+        return self.__class__, (self.formula, self.slot, self.slot_1, self.slot_2, self.begin, self.end)
+
+    def eval(self, delta_t: int) -> BooleanExpression:
+        return BE.DisjunctionBooleanExpression.make(self.formula.eval(delta_t),
+                                                    BE.WindowVarExpression(self.slot, self.slot_1, self.slot_2,
+                                                                           self.end - delta_t)
+                                                    if self.begin <= delta_t <= self.end else BE.FALSE)
 
 
 class NegFunctionalExpression(FunctionalExpression):
+    __slots__ = ('formula', 'timed')
+
     def __init__(self,
                  formula: FunctionalExpression):
         self.formula = formula
+        self.timed = formula.timed
+
+    def __reduce__(self):
+        return self.__class__, (self.formula,)
 
     def __str__(self):
         return "NOT {}".format(str(self.formula))
 
+    def eval(self, delta_t: int) -> BooleanExpression:
+        return BE.NegationBooleanExpression.make(self.formula.eval(delta_t))
+
+    def eval_beyond(self, delta_t: int) -> Optional[BooleanExpression]:
+        b_expr = self.formula.eval_beyond(delta_t)
+        return None if b_expr is None else BE.NegationBooleanExpression.make(b_expr)
+
 
 class ConjunctionFunctionalExpression(FunctionalExpression):
+    __slots__ = ('formula_1', 'formula_2', 'timed')
+
     def __init__(self,
                  formula_1: FunctionalExpression,
                  formula_2: FunctionalExpression):
         self.formula_1 = formula_1
         self.formula_2 = formula_2
+        self.timed = formula_1.timed or formula_2.timed
+
+    def __reduce__(self):
+        return self.__class__, (self.formula_1, self.formula_2)
 
     def __str__(self):
         return "{} OR {}".format(str(self.formula_1),
                                  str(self.formula_2))
 
+    def eval(self, delta_t: int) -> BooleanExpression:
+        return BE.ConjunctionBooleanExpression.make(self.formula_1.eval(delta_t),
+                                                    self.formula_2.eval(delta_t))
+
+    def eval_beyond(self, delta_t: int) -> Optional[BooleanExpression]:
+        b_expr_1 = self.formula_1.eval_beyond(delta_t)
+        if b_expr_1 is BE.TRUE:
+            return b_expr_1
+        b_expr_2 = self.formula_2.eval_beyond(delta_t)
+        if b_expr_2 is BE.TRUE:
+            return b_expr_2
+        if b_expr_1 is None or b_expr_2 is None:
+            return None
+        return BE.ConjunctionBooleanExpression.make(b_expr_1, b_expr_2)
+
 
 class DisjunctionFunctionalExpression(FunctionalExpression):
+    __slots__ = ('formula_1', 'formula_2', 'timed')
+
     def __init__(self,
                  formula_1: FunctionalExpression,
                  formula_2: FunctionalExpression):
         self.formula_1 = formula_1
         self.formula_2 = formula_2
+        self.timed = formula_1.timed or formula_2.timed
+
+    def __reduce__(self):
+        return self.__class__, (self.formula_1, self.formula_2)
 
     def __str__(self):
         return "{} AND {}".format(str(self.formula_1),
                                   str(self.formula_2))
+
+    def eval(self, delta_t: int) -> BooleanExpression:
+        return BE.DisjunctionBooleanExpression.make(self.formula_1.eval(delta_t),
+                                                    self.formula_2.eval(delta_t))
+
+    def eval_beyond(self, delta_t: int) -> Optional[BooleanExpression]:
+        b_expr_1 = self.formula_1.eval_beyond(delta_t)
+        if b_expr_1 is BE.FALSE:
+            return b_expr_1
+        b_expr_2 = self.formula_2.eval_beyond(delta_t)
+        if b_expr_2 is BE.FALSE:
+            return b_expr_2
+        if b_expr_1 is None or b_expr_2 is None:
+            return None
+        return BE.DisjunctionBooleanExpression.make(b_expr_1, b_expr_2)
+
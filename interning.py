@@ -0,0 +1,61 @@
+import inspect
+import itertools
+import weakref
+
+# creation order of the interned nodes, a total order on the living nodes
+_creation_order = itertools.count()
+
+
+class InternedMeta(type):
+    """
+    Metaclass for hash-consed nodes: constructing a node with the same arguments as a living node returns that node
+    instead of a new one. Identical (sub-)trees are therefore shared and can be hashed and compared by identity.
+    """
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        cls._instances = {}
+        parameters = list(inspect.signature(cls.__init__).parameters.values())[1:]
+        cls._parameters = tuple(parameter.name for parameter in parameters
+                                if parameter.kind == parameter.POSITIONAL_OR_KEYWORD)
+
+        instances = cls._instances
+
+        def _remove(reference):
+            if instances.get(reference.key) is reference:
+                del instances[reference.key]
+
+        cls._remove = staticmethod(_remove)
+
+    def __call__(cls, *args, **kwargs):
+        if kwargs:
+            args += tuple([kwargs[name] for name in cls._parameters[len(args):]])
+
+        reference = cls._instances.get(args)
+        if reference is not None:
+            instance = reference()
+            if instance is not None:
+                return instance
+
+        instance = super().__call__(*args)
+        instance._interned_args = args
+        instance._interned_order = next(_creation_order)
+        cls._instances[args] = weakref.KeyedRef(instance, cls._remove, args)
+        return instance
+
+
+class Interned(metaclass=InternedMeta):
+    """
+    Base class of hash-consed nodes. Nodes are immutable, equality and hashing are inherited from object, i.e. they are
+    identity based. Nodes are numbered in the order of their creation, which orders the operands of canonical forms.
+    Subclasses declare their attributes in __slots__ to avoid a dict per node; __weakref__ is kept for the interning.
+    """
+    __slots__ = ('_interned_args', '_interned_order', '__weakref__')
+
+    def __reduce__(self):
+        return self.__class__, self._interned_args
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
@@ -0,0 +1,221 @@
+import boolean_expression as BE
+
+from bdd import DecisionBooleanExpression
+
+import sys
+import time
+
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class Histogram:
+    """
+    Histogram of non-negative values in buckets of powers of two, i.e. bucket b counts the values v with
+    2 ** (b - 1) <= v < 2 ** b (bucket 0 counts the values below 1).
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.maximum = 0
+        self.buckets = {}
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+        bucket = int(value).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> int:
+        """
+        Upper bound of the bucket of the q-quantile.
+        """
+        rank = q * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return 2 ** bucket
+        return 0
+
+    def export(self) -> Dict:
+        return {'count': self.count,
+                'sum': self.total,
+                'max': self.maximum,
+                'buckets': {2 ** bucket: count for bucket, count in sorted(self.buckets.items())}}
+
+
+class MonitorMetrics:
+    """
+    Metrics of the steps of a monitor, which are only recorded if the monitor has been created with metrics.
+
+    Histograms:
+    1. eval_us, history_us, progress_us and step_us: wall time of the phases of a step and of the whole step,
+    2. history_size: pending verdicts after a step,
+    3. tree_size: distinct nodes of the boolean expressions of the pending verdicts,
+    4. allocations: memory blocks allocated (minus the freed ones) by a step and
+    5. verdict_latency: number of events from an event until its verdict is resolved, 0 if it is resolved by a
+       heartbeat before the next event.
+    tree_size and allocations are only sampled every sample_interval steps, allocations only if track_allocations.
+
+    Counters: steps, heartbeats (see Monitor.advance_time), verdicts, and the evaluated and skipped slots (see
+    Monitor._step).
+    """
+    histogram_names = ('eval_us', 'history_us', 'progress_us', 'step_us', 'history_size', 'tree_size', 'allocations',
+                       'verdict_latency')
+
+    def __init__(self, sample_interval: int = 1, track_allocations: bool = False):
+        assert sample_interval > 0, "Invalid sample interval {}".format(sample_interval)
+        self.sample_interval = sample_interval
+        self.track_allocations = track_allocations
+        self.counters = {'steps': 0, 'heartbeats': 0, 'verdicts': 0, 'evaluated': 0, 'skipped': 0}
+        self.histograms = {name: Histogram() for name in self.histogram_names}
+
+        # positions (timestamp and offset) of the events and the steps in which they have been processed
+        self._positions = []
+        self._position_steps = []
+
+    def measure_step(self, monitor, timestamp: int, character: str, mask: int, formula_verdicts):
+        """
+        Run a step of the monitor (see Monitor._step) and record it.
+        """
+        histograms = self.histograms
+        sampled = monitor.step_count % self.sample_interval == 0
+        allocations = sys.getallocatedblocks() if sampled and self.track_allocations else 0
+
+        position = (monitor.current_timestamp, monitor.current_timestamp_offset)
+        start = time.perf_counter()
+        if monitor.advanced_timestamp is None:
+            delta_t = monitor._evaluate(timestamp)
+            evaluated = time.perf_counter()
+            monitor._update_history(delta_t, formula_verdicts)
+        else:
+            # evaluated by advance_time
+            delta_t = monitor._resume(timestamp)
+            evaluated = time.perf_counter()
+        filtered = time.perf_counter()
+        monitor._progress(timestamp, character, mask, delta_t)
+        progressed = time.perf_counter()
+
+        if sampled and self.track_allocations:
+            histograms['allocations'].observe(max(sys.getallocatedblocks() - allocations, 0))
+
+        histograms['eval_us'].observe(1e6 * (evaluated - start))
+        histograms['history_us'].observe(1e6 * (filtered - evaluated))
+        histograms['progress_us'].observe(1e6 * (progressed - filtered))
+        histograms['step_us'].observe(1e6 * (progressed - start))
+
+        counters = self.counters
+        counters['steps'] += 1
+        counters['evaluated'] += monitor.evaluated
+        counters['skipped'] += monitor.skipped
+
+        # the history of this step holds the verdicts of the position of the preceding event
+        step = monitor.step_count
+        if step == 1:
+            del self._positions[:]
+            del self._position_steps[:]
+        self._positions.append(position)
+        self._position_steps.append(step - 1)
+
+        self._record_verdicts(monitor, formula_verdicts, step)
+
+        histories = monitor._pending_histories()
+        pending = sum(len(history) for history in histories)
+        histograms['history_size'].observe(pending)
+        if sampled:
+            histograms['tree_size'].observe(_tree_size(history.keys() for history in histories))
+
+        # positions are only dropped now and then, as the pending ones are not ordered
+        if len(self._positions) > 2 * pending + 64:
+            self._forget_positions(histories)
+
+    def measure_advance(self, monitor, timestamp: int, formula_verdicts):
+        """
+        Advance the time of the monitor (see Monitor._advance_time) and record the verdicts it resolves and the slots it
+        evaluates.
+        """
+        step = monitor.step_count
+        monitor._advance_time(timestamp, formula_verdicts)
+
+        counters = self.counters
+        counters['heartbeats'] += 1
+        if monitor.step_count != step:
+            # the slots have been evaluated for a time distance beyond the horizon, the next event only progresses them
+            counters['evaluated'] += monitor.evaluated
+        self._record_verdicts(monitor, formula_verdicts, step,
+                              (monitor.current_timestamp, monitor.current_timestamp_offset))
+
+    def _record_verdicts(self,
+                         monitor,
+                         formula_verdicts,
+                         step: int,
+                         current: Optional[Tuple[int, int]] = None):
+        """
+        Count the resolved verdicts and observe their latency up to the event of the step. The verdict of the current
+        position, which is not recorded yet, can only be resolved by a heartbeat before the next event.
+        """
+        counters = self.counters
+        latency = self.histograms['verdict_latency']
+        for verdicts in monitor._resolved_verdicts(formula_verdicts):
+            counters['verdicts'] += len(verdicts)
+            for time_info, _ in verdicts:
+                k = bisect_left(self._positions, time_info)
+                if k < len(self._positions) and self._positions[k] == time_info:
+                    latency.observe(step - self._position_steps[k])
+                elif time_info == current:
+                    latency.observe(0)
+
+    def _forget_positions(self, histories: List[Dict[BE.BooleanExpression, Tuple[int, int]]]):
+        pending = set()
+        for history in histories:
+            pending.update(history.values())
+        pending.add(self._positions[-1])
+
+        kept = [k for k, position in enumerate(self._positions) if position in pending]
+        self._positions = [self._positions[k] for k in kept]
+        self._position_steps = [self._position_steps[k] for k in kept]
+
+    def export(self) -> Dict:
+        """
+        Counters and histograms as a dictionary, e.g. for JSON.
+        """
+        return {'counters': dict(self.counters),
+                'histograms': {name: histogram.export() for name, histogram in self.histograms.items()}}
+
+    def summary(self) -> str:
+        lines = ["{}: {}".format(name, count) for name, count in self.counters.items()]
+        for name, histogram in self.histograms.items():
+            if histogram.count:
+                lines.append("{}: mean {:.1f}, p50 <{}, p99 <{}, max {:.1f}".format(name, histogram.mean(),
+                                                                                   histogram.quantile(0.5),
+                                                                                   histogram.quantile(0.99),
+                                                                                   histogram.maximum))
+        return "\n".join(lines)
+
+
+def _tree_size(expression_groups: Iterable[Iterable[BE.BooleanExpression]]) -> int:
+    """
+    Number of distinct nodes of boolean expressions, shared sub-expressions are counted once.
+    """
+    seen = set()
+    stack = [b_expr for b_exprs in expression_groups for b_expr in b_exprs]
+    while stack:
+        b_expr = stack.pop()
+        if b_expr in seen:
+            continue
+        seen.add(b_expr)
+        if isinstance(b_expr, BE.NegationBooleanExpression):
+            stack.append(b_expr.formula)
+        elif isinstance(b_expr, BE.ConjunctionBooleanExpression) or isinstance(b_expr, BE.DisjunctionBooleanExpression):
+            stack.append(b_expr.formula_1)
+            stack.append(b_expr.formula_2)
+        elif isinstance(b_expr, DecisionBooleanExpression):
+            stack.append(b_expr.high)
+            stack.append(b_expr.low)
+    return len(seen)
@@ -2,231 +2,367 @@ import formula as F
 import boolean_expression as BE
 import functional_expression as FE
 
+from atoms import Character
+from bdd import decision_diagram
+from compiler import compile_formula, Plan, NOW_FALSE, NOW_TRUE
+from formula_parser import compile_text, normalize, parse
+from metrics import MonitorMetrics
+
 import test_cases
 
-from typing import List, Tuple, Set, Optional
+import io
+import pickle
+
+from array import array
+from collections import deque, namedtuple
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple, Set, Optional, Union
+
+
+# (timestamp, offset, verdict) tuples of a trace in the order of iter_verdicts and the result of the whole trace
+MonitorResult = namedtuple('MonitorResult', ['verdicts', 'satisfied'])
+
 
 class Monitor:
+    # state of the monitor which is written by snapshot and read by restore
+    _snapshot_attributes = ('history', 'current_timestamp', 'current_timestamp_offset', 'current_character',
+                            'previous', 'current', 'previous_mask', 'current_mask', 'windows',
+                            'step_count', 'last_delta_t', 'delta_changed', 'previous_changed', 'current_changed',
+                            'advanced_timestamp', 'resolved_formulae')
+
     def __init__(self,
-                 formula: F.Formula,
-                 debug_mode: Optional[bool] = False):
+                 formula: Union[F.Formula, str],
+                 debug_mode: Optional[bool] = False,
+                 window_mode: Optional[bool] = False,
+                 metrics: Optional[MonitorMetrics] = None,
+                 bdd_mode: Optional[bool] = False):
+        """
+        The formula may be given as text (see formula_parser.parse), whose plan is cached by its normalized text.
+        In window mode, temporal operators are not unrolled into one sub-formula per decremented interval (see Plan),
+        so memory is proportional to the events inside the intervals instead of to the interval bounds.
+        If metrics are given, every step is measured into them (see MonitorMetrics).
+        In BDD mode, pending verdicts are kept as decision diagrams, so all equivalent verdicts merge in the history
+        instead of only those with the same canonical form.
+        """
+        if isinstance(formula, str):
+            self.formula_text = normalize(formula)
+            formula = parse(formula)
+        else:
+            self.formula_text = None
         self.formula = formula
         self.debug_mode = debug_mode
+        self.window_mode = window_mode
+        self.metrics = metrics
+        self.bdd_mode = bdd_mode
         self._reset()
 
     def _reset(self):
-        self.history = set()
-        self.subformulae = []
-        self.current = []
-        self.previous = []
+        self.history = {}
         self.current_timestamp = -1
         self.current_timestamp_offset = 0
         self.current_character = ''
         self._create_arrays()
 
     def _create_arrays(self):
-        self._create_array_recursion_helper(self.formula)
-
-        # reverse the list of sub-formulae as they have been inserted in the reverse order
-        self.subformulae = list(reversed(self.subformulae))
-
-        self.N = len(self.subformulae)
-
-    def _create_array_recursion_helper(self,
-                                       formula: F.Formula):
-
+        # the compiled plan is cached, so only the arrays are created per monitor
+        self.plan = self._compile()
+        self.subformulae = self.plan.subformulae
+        self.formula_index = self.plan.formula_index
+        self.children = self.plan.children
+        self.siblings = self.plan.siblings
+        self.N = self.plan.N
+        self._initialize_arrays()
+
+    def _initialize_arrays(self):
         # initialize arrays with expressions which evaluate to False
-        # also keep track of the formulae
-
-        def _add_formula(self, formula):
-            self.subformulae.append(formula)
-            self.previous.append(BE.FalseBooleanExpression())
-            self.current.append(FE.NowFormulaExpression(BE.FalseBooleanExpression()))
-
-        _add_formula(self, formula)
-
-        # add all possible intervals as sub-formulae to ensure that they are evaluated first
-        if (isinstance(formula, F.Until) or isinstance(formula, F.Since)
-                or isinstance(formula, F.Next) or isinstance(formula, F.Previous)):
-
-            current_formula = formula
-            while not current_formula.interval.is_empty():
-                current_formula = current_formula.copy()
-                current_formula.interval.decrement()
-                _add_formula(self, current_formula)
-
-        # recursion step: add all sub-formulae to the array
-        if isinstance(formula, F.Negation) or isinstance(formula, F.Next) or isinstance(formula, F.Previous):
-            self._create_array_recursion_helper(formula.formula)
-        elif isinstance(formula, F.Until) or isinstance(formula, F.Since) or isinstance(formula, F.Conjunction):
-            self._create_array_recursion_helper(formula.formula1)
-            self._create_array_recursion_helper(formula.formula2)
-
-    def substitute_boolean_expression(self, expr: BE.BooleanExpression) -> BE.BooleanExpression:
-        out = None
-        if isinstance(expr, BE.FalseBooleanExpression) or isinstance(expr, BE.TrueBooleanExpression):
-            out = expr
-        elif isinstance(expr, BE.VarExpression):
-            out = self.previous[expr.var]
-        elif isinstance(expr, BE.NegVarExpression):
-            out = BE.NegationBooleanExpression(self.previous[expr.var])
-        elif isinstance(expr, BE.DisjunctionBooleanExpression):
-            out = BE.DisjunctionBooleanExpression(formula_1=self.substitute_boolean_expression(expr.formula_1),
-                                                  formula_2=self.substitute_boolean_expression(expr.formula_2))
+        self.previous = [BE.FALSE] * self.N
+        self.current = [NOW_FALSE] * self.N
+        self.previous_mask = 0
+        self.current_mask = 0
+
+        # steps in which the values of the slots have changed last and the time distance of the last step, which decide
+        # the slots that are evaluated incrementally (see _step); steps are kept unboxed in typed arrays
+        self.step_count = 0
+        self.last_delta_t = None
+        self.delta_changed = True
+        self.previous_changed = array('q', bytes(8 * self.N))
+        self.current_changed = array('q', bytes(8 * self.N))
+
+        # timestamp up to which the time has been advanced without an event and the indices of the formulae whose verdict
+        # at the current position has been resolved by it, see advance_time
+        self.advanced_timestamp = None
+        self.resolved_formulae = set()
+
+        # number of temporal slots evaluated (eval and progress) and skipped in the last step
+        self.evaluated = 0
+        self.skipped = 0
+
+        # windows of the SINCE slots in window mode, see Plan
+        if self.window_mode:
+            self.windows = [deque() if isinstance(formula, F.Since) else None for formula in self.subformulae]
+        else:
+            self.windows = None
 
-        elif isinstance(expr, BE.ConjunctionBooleanExpression):
-            out = BE.ConjunctionBooleanExpression(formula_1=self.substitute_boolean_expression(expr.formula_1),
-                                                  formula_2=self.substitute_boolean_expression(expr.formula_2))
+    def _compile(self) -> Plan:
+        if self.formula_text is not None:
+            return compile_text(self.formula_text, self.window_mode)
+        return compile_formula(self.formula, self.window_mode)
 
-        return out.simplify()
+    def substitute_boolean_expression(self,
+                                      expr: BE.BooleanExpression,
+                                      delta_t: int,
+                                      substitutions: Optional[Dict[BE.BooleanExpression, BE.BooleanExpression]] = None) -> BE.BooleanExpression:
+        return expr.substitute(self.previous, delta_t, substitutions)
 
     def substitute_functional_expression(self, expr: BE.BooleanExpression) -> FE.FunctionalExpression:
-        if isinstance(expr, BE.FalseBooleanExpression) or isinstance(expr, BE.TrueBooleanExpression):
-            return FE.NowFormulaExpression(expr)
+        if expr is BE.FALSE:
+            return NOW_FALSE
+        elif expr is BE.TRUE:
+            return NOW_TRUE
         elif isinstance(expr, BE.VarExpression):
             return self.current[expr.var]
         elif isinstance(expr, BE.NegVarExpression):
             return FE.NegFunctionalExpression(formula=self.current[expr.var])
+        elif isinstance(expr, BE.NegationBooleanExpression):
+            return FE.NegFunctionalExpression(formula=self.substitute_functional_expression(expr.formula))
+        elif isinstance(expr, BE.WindowVarExpression):
+            return FE.ConjunctionFunctionalExpression(formula_1=self.current[expr.var_2],
+                                                      formula_2=FE.LaterWindowUntilExpression(self.current[expr.var_1],
+                                                                                              expr.var, expr.var_1,
+                                                                                              expr.var_2, 0,
+                                                                                              expr.remaining))
         elif isinstance(expr, BE.DisjunctionBooleanExpression):
-            return FE.DisjunctionFunctionalExpression(formula_1=self.substitute_functional_expression(self.current[self.get_formula_index(expr.formula_1)]),
-                                                      formula_2=self.substitute_functional_expression(self.current[self.get_formula_index(expr.formula_2)]))
+            return FE.DisjunctionFunctionalExpression(formula_1=self.substitute_functional_expression(expr.formula_1),
+                                                      formula_2=self.substitute_functional_expression(expr.formula_2))
 
         elif isinstance(expr, BE.ConjunctionBooleanExpression):
-            return FE.ConjunctionFunctionalExpression(formula_1=self.substitute_functional_expression(self.current[self.get_formula_index(expr.formula_1)]),
-                                                      formula_2=self.substitute_functional_expression(self.current[self.get_formula_index(expr.formula_2)]))
+            return FE.ConjunctionFunctionalExpression(formula_1=self.substitute_functional_expression(expr.formula_1),
+                                                      formula_2=self.substitute_functional_expression(expr.formula_2))
 
 
-    def filter_verdicts(self, history: Set[Tuple[Tuple[int, int], BE.BooleanExpression]]) -> Set[Tuple[Tuple[int, int], BE.BooleanExpression]]:
+    def filter_verdict(self,
+                       history: Dict[BE.BooleanExpression, Tuple[int, int]],
+                       formula_verdicts: Set[Tuple[Tuple[int, int], BE.BooleanExpression]],
+                       time_info: Tuple[int, int],
+                       b_expr: BE.BooleanExpression):
         """
-        In-place removal of verdicts which are either
-        1. evaluated to true or false expressions or
-        2. have an equivalent boolean expression to other elements in the history
+        Incremental insertion of a verdict which is either
+        1. added to the formula verdicts if it is evaluated to a true or false expression or
+        2. added to the history if it is the earliest verdict with its boolean expression.
+        Entries with an equivalent boolean expression, but a later timestamp (or offset) are dropped.
         """
-        formula_verdicts = self._filter_true_or_false_verdicts(history)
-        self._filter_equivalent_verdicts(history)
+        if b_expr is BE.TRUE or b_expr is BE.FALSE:
+            formula_verdicts.add((time_info, b_expr))
+            return
 
-        return formula_verdicts
+        earliest = history.get(b_expr)
+        if earliest is None or time_info < earliest:
+            history[b_expr] = time_info
 
-    def _filter_equivalent_verdicts(self, history: Set[Tuple[Tuple[int, int], BE.BooleanExpression]]):
+    def canonical_verdict(self,
+                          b_expr: BE.BooleanExpression,
+                          diagrams: Optional[Dict]) -> BE.BooleanExpression:
         """
-        Remove entries from the history with the same boolean expression, but with different timestamps.
+        Pending verdict as it is kept in the history: its decision diagram in BDD mode (diagrams is then the memo of the
+        step, see decision_diagram), otherwise the expression itself.
         """
-        elements_to_remove = set()
-        for entry1 in history:
-            ((timestamp1, offset1), b_expr1) = entry1
+        if diagrams is None:
+            return b_expr
+        return decision_diagram(b_expr, diagrams)
 
-            for entry2 in history:
-                ((timestamp2, offset2), b_expr2) = entry2
+    def eval(self, f_expr: FE.FunctionalExpression, delta_t: int) -> BE.BooleanExpression:
+        return f_expr.eval(delta_t)
 
-                # skip entries if they do not have the same boolean expression
-                if entry1 == entry2 or b_expr1 != b_expr2:
-                    continue
+    def get_formula_index(self, formula: F.Formula) -> int:
+        assert formula in self.formula_index, "Array contents: {} \n Formula {}".format(self.subformulae, formula)
+        return self.formula_index[formula]
 
-                # remove entries with a larger timestamp (and the same boolean expression)
-                if (timestamp1 == timestamp2 and offset1 < offset2) or timestamp1 < timestamp2:
-                    elements_to_remove.add(entry2)
+    def progress(self, formula_idx: int, delta_t: int, character: str) -> FE.FunctionalExpression:
+        return self.plan.progressors[formula_idx](self, delta_t, character)
 
-        for entry in elements_to_remove:
-            history.remove(entry)
+    def step(self, timestamp: int, character: Character) -> Set[Tuple[Tuple[int, int], BE.BooleanExpression]]:
+        """
+        Process an event and return the resolved verdicts. The character of the event is a symbol or a set of atoms
+        which all hold at the event, given as a set or as its bitmask (see atoms.atom_mask), so facts of the same time
+        need not be split into several events.
+        """
+        formula_verdicts = set()
+        self._step(timestamp, character, self.plan.propositional_mask(character), formula_verdicts)
+        return formula_verdicts
 
-    def _filter_true_or_false_verdicts(self, history: Set[Tuple[Tuple[int, int], BE.BooleanExpression]]):
+    def step_many(self,
+                  timestamps: Sequence[int],
+                  characters: Sequence,
+                  symbols: Optional[Sequence[str]] = None) -> List[Tuple[int, int, bool]]:
         """
-        Remove entries from the history with a boolean expression that is already evaluated to either True or False.
+        Process a chunk of events, e.g. a slice of a recorded log, given as a sequence of timestamps and a sequence of
+        characters. If a symbol table is given, the characters are integer codes into it, whose propositional bitmasks
+        are cached by the plan per symbol table (see Plan.symbol_masks) instead of being looked up per event.
+        Returns the (timestamp, offset, verdict) tuples resolved by the whole chunk in the order of iter_verdicts.
         """
-        elements_to_remove = set()
-        for entry in history:
-            (_, b_expr) = entry
-            if b_expr == BE.TrueBooleanExpression() or b_expr == BE.FalseBooleanExpression():
-                elements_to_remove.add(entry)
-        for entry in elements_to_remove:
-            history.remove(entry)
+        assert len(timestamps) == len(characters), "Got {} timestamps for {} characters".format(len(timestamps),
+                                                                                                 len(characters))
+        symbol_masks = None if symbols is None else self.plan.symbol_masks(symbols)
+        propositional_mask = self.plan.propositional_mask
+        step = self._step
+
+        verdicts = []
+        formula_verdicts = set()
+        for timestamp, character in zip(timestamps, characters):
+            if symbol_masks is None:
+                step(timestamp, character, propositional_mask(character), formula_verdicts)
+            else:
+                step(timestamp, symbols[character], symbol_masks[character], formula_verdicts)
+
+            # most events resolve at most one verdict, which needs no sorting
+            if len(formula_verdicts) == 1:
+                (verdict_timestamp, offset), b_expr = formula_verdicts.pop()
+                verdicts.append((verdict_timestamp, offset, b_expr is BE.TRUE))
+            elif formula_verdicts:
+                for ((verdict_timestamp, offset), b_expr) in sorted(formula_verdicts, key=itemgetter(0)):
+                    verdicts.append((verdict_timestamp, offset, b_expr is BE.TRUE))
+                formula_verdicts.clear()
+
+        return verdicts
+
+    def _step(self,
+              timestamp: int,
+              character: str,
+              mask: int,
+              formula_verdicts: Set[Tuple[Tuple[int, int], BE.BooleanExpression]]):
+        """
+        Process an event whose character satisfies the propositional slots in the bitmask.
 
-        return elements_to_remove
+        Slots are evaluated incrementally: a slot is only evaluated if its current value has changed in the last step or
+        depends on the time distance, which has changed. A slot is only progressed if the values of the slots it reads
+        have changed in this step (see Plan._dependencies).
+        """
+        if self.metrics is not None:
+            self.metrics.measure_step(self, timestamp, character, mask, formula_verdicts)
+            return
 
-    def eval(self, f_expr: FE.FunctionalExpression, delta_t: int) -> BE.BooleanExpression:
-        out = None
-        if isinstance(f_expr, FE.NowFormulaExpression):
-            out = f_expr.bool_expr
-        elif isinstance(f_expr, FE.LaterFormulaExpression):
-            out = f_expr.bool_expr(delta_t)
-        elif isinstance(f_expr, FE.NegFunctionalExpression):
-            out = BE.NegationBooleanExpression(self.eval(f_expr.formula, delta_t))
-        elif isinstance(f_expr, FE.DisjunctionFunctionalExpression):
-            out = BE.DisjunctionBooleanExpression(formula_1=self.eval(f_expr.formula_1, delta_t),
-                                                  formula_2=self.eval(f_expr.formula_2, delta_t))
-
-        elif isinstance(f_expr, FE.ConjunctionFunctionalExpression):
-            out = BE.ConjunctionBooleanExpression(formula_1=self.eval(f_expr.formula_1, delta_t),
-                                                  formula_2=self.eval(f_expr.formula_2, delta_t))
-
-        return out.simplify()
+        if self.advanced_timestamp is None:
+            delta_t = self._evaluate(timestamp)
+            self._update_history(delta_t, formula_verdicts)
+        else:
+            delta_t = self._resume(timestamp)
+        self._progress(timestamp, character, mask, delta_t)
 
-    def get_formula_index(self, formula: F.Formula) -> int:
-        """
-        TODO: Access to sub-formulae currently needs to iterate over list -> use pointers to sub-formualae
+    def advance_time(self, timestamp: int) -> Set[Tuple[Tuple[int, int], BE.BooleanExpression]]:
         """
-        assert formula in self.subformulae, "Array contents: {} \n Formula {}".format(self.subformulae, formula)
-        return self.subformulae.index(formula)
+        Heartbeat: no event occurs before the timestamp. Returns the verdicts which are resolved by the time that has
+        passed (see step).
 
-    def progress(self, formula_idx: int, delta_t: int, character: str) -> FE.FunctionalExpression:
-        formula = self.subformulae[formula_idx]
+        The pending verdicts which are the same for every time distance from the time that has passed on are resolved
+        right away, e.g. a NEXT whose interval has passed fails whatever UNTIL it is combined with. Once the time since
+        the last event exceeds the horizon of the plan, the next time distance is known to lie beyond every interval, so
+        the slots are evaluated and all pending verdicts are resolved; the next event then only progresses the slots.
+        """
+        formula_verdicts = set()
+        self._advance(timestamp, formula_verdicts)
+        return formula_verdicts
 
-        if isinstance(formula, F.Proposition):
-            if character == formula.character:
-                return FE.NowFormulaExpression(BE.TrueBooleanExpression())
+    def _advance(self, timestamp: int, formula_verdicts):
+        if self.metrics is not None:
+            self.metrics.measure_advance(self, timestamp, formula_verdicts)
+            return
+        self._advance_time(timestamp, formula_verdicts)
+
+    def _advance_time(self, timestamp: int, formula_verdicts):
+        assert timestamp >= self.current_timestamp, \
+            "Cannot advance the time from {} back to {}".format(self.current_timestamp, timestamp)
+        if self.advanced_timestamp is not None:
+            # the slots have already been evaluated for a time distance beyond the horizon
+            self.advanced_timestamp = max(self.advanced_timestamp, timestamp)
+        elif self.step_count > 0:
+            delta_t = timestamp - self.current_timestamp
+            if delta_t > self.plan.horizon:
+                self._update_history(self._evaluate(timestamp), formula_verdicts)
+                self.advanced_timestamp = timestamp
             else:
-                return FE.NowFormulaExpression(BE.FalseBooleanExpression())
-
-        elif isinstance(formula, F.Negation):
-            return FE.NegFunctionalExpression(formula=self.current[self.get_formula_index(formula.formula)])
+                self._resolve_beyond(delta_t, formula_verdicts)
 
-        elif isinstance(formula, F.Conjunction):
-            return FE.ConjunctionFunctionalExpression(formula_1=self.current[self.get_formula_index(formula.formula1)],
-                                                      formula_2=self.current[self.get_formula_index(formula.formula2)])
-
-        elif isinstance(formula, F.Previous):
+    def _resolve_beyond(self, delta_t: int, formula_verdicts):
+        """
+        Resolve the pending verdicts which are the same for every time distance from delta_t on, i.e. wherever the next
+        event occurs. The slots are not evaluated: the verdicts are substituted with the values of the slots which do not
+        depend on the time distance beyond delta_t and with the variables of the other slots, which stand for any value.
+        """
+        previous = []
+        for k, f_expr in enumerate(self.current):
+            b_expr = f_expr.eval_beyond(delta_t)
+            previous.append(BE.VarExpression(k) if b_expr is None else b_expr)
+
+        time_info = (self.current_timestamp, self.current_timestamp_offset)
+        substitutions = {}
+        for formula_idx, (root, history, verdicts) in enumerate(zip(self.plan.roots, self._pending_histories(),
+                                                                    self._resolved_verdicts(formula_verdicts))):
+            b_expr = previous[root]
+            if (b_expr is BE.TRUE or b_expr is BE.FALSE) and formula_idx not in self.resolved_formulae:
+                verdicts.add((time_info, b_expr))
+                self.resolved_formulae.add(formula_idx)
+            for pending, verdict_time_info in list(history.items()):
+                b_expr = pending.substitute(previous, delta_t, substitutions)
+                if b_expr is BE.TRUE or b_expr is BE.FALSE:
+                    verdicts.add((verdict_time_info, b_expr))
+                    del history[pending]
+
+    def _resume(self, timestamp: int) -> int:
+        """
+        Continue after advance_time with an event: the slots have already been evaluated for its time distance.
+        """
+        assert timestamp >= self.advanced_timestamp, \
+            "Event at {} before the time has been advanced to {}".format(timestamp, self.advanced_timestamp)
+        self.advanced_timestamp = None
+        self.evaluated = 0
+        return timestamp - self.current_timestamp
 
-            # NOTE: simplified expansion of previous case
-            if formula.interval.is_in_interval(delta_t):
-                return self.substitute_functional_expression(self.previous[self.get_formula_index(formula.formula)])
-            else:
-                return FE.NowFormulaExpression(BE.FalseBooleanExpression())
-
-        elif isinstance(formula, F.Next):
-            return FE.LaterFormulaExpression(boolean_expr=lambda x: BE.VarExpression(self.get_formula_index(formula.formula))
-                                                                    if formula.interval.is_in_interval(x)
-                                                                    else BE.FalseBooleanExpression())
-
-        elif isinstance(formula, F.Since):
-            return FE.ConjunctionFunctionalExpression(formula_1=FE.NowFormulaExpression(BE.FalseBooleanExpression())
-                                                        if formula.interval.begin == 0
-                                                        else self.current[self.get_formula_index(formula.formula2)],
-                                                      formula_2=FE.NowFormulaExpression(BE.FalseBooleanExpression())
-                                                        if delta_t <= formula.interval.end
-                                                        else FE.ConjunctionFunctionalExpression(formula_1=self.current[self.get_formula_index(formula.formula1)],
-                                                                                                formula_2=self.substitute_functional_expression(self.previous[formula_idx - delta_t]))
-                                                      )
-        elif isinstance(formula, F.Until):
-            return FE.ConjunctionFunctionalExpression(formula_1=self.current[self.get_formula_index(formula.formula2)]
-                                                        if formula.interval.begin == 0
-                                                        else FE.NowFormulaExpression(BE.FalseBooleanExpression()),
-                                                      formula_2=FE.LaterFormulaExpression(lambda x: BE.DisjunctionBooleanExpression(formula_1=self.eval(self.current[self.get_formula_index(formula.formula1)], x),
-                                                                                                                                    formula_2=BE.VarExpression(formula_idx - x)
-                                                                                                                                    if formula.interval.is_in_interval(x) else BE.FalseBooleanExpression())
-                                                                                          )
-                                                      )
-
-    def step(self, timestamp: int, character: str) -> Set[Tuple[Tuple[int, int], BE.BooleanExpression]]:
+    def _evaluate(self, timestamp: int) -> int:
+        """
+        Evaluate the current values of the slots for the time distance to the event into the previous array.
+        Time distances beyond the horizon of the plan evaluate alike, so they are evaluated as horizon + 1 and a series
+        of large gaps does not re-evaluate the slots which depend on the time distance.
+        """
         delta_t = timestamp - self.current_timestamp
-        for k in range(self.N):
-            self.previous[k] = self.eval(self.current[k], delta_t)
-
-        filtering_input = set()
-        filtering_input.add(((self.current_timestamp, self.current_timestamp_offset), self.previous[-1]))
-        for time_info, c in self.history:
-            filtering_input.add((time_info, self.substitute_boolean_expression(c)))
-        formula_verdicts = self.filter_verdicts(filtering_input)
-        self.history = filtering_input
+        plan = self.plan
+        previous = self.previous
+        current = self.current
+        previous_changed = self.previous_changed
+        current_changed = self.current_changed
+        step = self.step_count = self.step_count + 1
+        eval_delta_t = delta_t if delta_t <= plan.horizon else plan.horizon + 1
+        delta_changed = self.delta_changed = eval_delta_t != self.last_delta_t
+        self.last_delta_t = eval_delta_t
+        evaluated = 0
+
+        # propositional slots are taken from the bitmask of the preceding event, the others are evaluated
+        _update_propositional_slots(previous, self.previous_mask, self.current_mask, BE.TRUE, BE.FALSE,
+                                    previous_changed, step)
+        self.previous_mask = self.current_mask
+        for k, _ in plan.temporal_progressors:
+            f_expr = current[k]
+            if current_changed[k] == step - 1 or (delta_changed and f_expr.timed):
+                evaluated += 1
+                b_expr = f_expr.eval(eval_delta_t)
+                if b_expr is not previous[k]:
+                    previous[k] = b_expr
+                    previous_changed[k] = step
+
+        self.evaluated = evaluated
+        return delta_t
+
+    def _progress(self, timestamp: int, character: str, mask: int, delta_t: int):
+        """
+        Move to the event and progress the slots into the current array.
+        """
+        plan = self.plan
+        previous = self.previous
+        current = self.current
+        previous_changed = self.previous_changed
+        current_changed = self.current_changed
+        step = self.step_count
+        delta_changed = self.delta_changed
+        evaluated = self.evaluated
 
         self.current_timestamp = timestamp
         self.current_character = character
@@ -235,10 +371,82 @@ class Monitor:
         else:
             self.current_timestamp_offset += 1
 
-        for k in range(self.N):
-            self.current[k] = self.progress(k, delta_t, character)
-
-        return formula_verdicts
+        _update_propositional_slots(current, self.current_mask, mask, NOW_TRUE, NOW_FALSE, current_changed, step)
+        self.current_mask = mask
+        for k, progress, inputs, previous_inputs, timed, always in plan.temporal_dependencies:
+            if always or step == 1 or (timed and delta_changed):
+                dirty = True
+            else:
+                dirty = False
+                previous_input = previous_inputs[delta_t] if previous_inputs and delta_t < len(previous_inputs) \
+                    else None
+                if previous_input is not None:
+                    # a substituted previous value reads the current values of the slots it refers to
+                    b_expr = previous[previous_input]
+                    dirty = previous_changed[previous_input] == step or not (b_expr is BE.TRUE or b_expr is BE.FALSE)
+                if not dirty:
+                    for child in inputs:
+                        if current_changed[child] == step:
+                            dirty = True
+                            break
+
+            if dirty:
+                evaluated += 1
+                f_expr = progress(self, delta_t, character)
+                if f_expr is not current[k]:
+                    current[k] = f_expr
+                    current_changed[k] = step
+
+        self.evaluated = evaluated
+        self.skipped = 2 * len(plan.temporal_progressors) - evaluated
+
+    def _update_history(self,
+                        delta_t: int,
+                        formula_verdicts: Set[Tuple[Tuple[int, int], BE.BooleanExpression]]):
+        """
+        Add the verdict of the current position to the history, unless advance_time has resolved it, and substitute the
+        pending verdicts.
+        """
+        history = {}
+        diagrams = {} if self.bdd_mode else None
+        if self.resolved_formulae:
+            self.resolved_formulae = set()
+        else:
+            self.filter_verdict(history, formula_verdicts, (self.current_timestamp, self.current_timestamp_offset),
+                                self.canonical_verdict(self.previous[-1], diagrams))
+        if self.history:
+            substitutions = {}
+            for b_expr, time_info in self.history.items():
+                b_expr = self.substitute_boolean_expression(b_expr, delta_t, substitutions)
+                self.filter_verdict(history, formula_verdicts, time_info, self.canonical_verdict(b_expr, diagrams))
+        self.history = history
+
+    def snapshot(self) -> bytes:
+        """
+        Serialize the state of the monitor into a binary blob from which a monitor of the same formula continues with
+        restore, e.g. after a restart of the process. Only restore snapshots from trusted sources, they are pickled.
+        """
+        # the sibling variables are part of the plan, so they are referenced by their slot
+        sibling_index = self.plan.sibling_index
+        buffer = io.BytesIO()
+        pickler = pickle.Pickler(buffer, pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = lambda obj: sibling_index.get(id(obj))
+        pickler.dump((self.plan.formulae, self.window_mode))
+        pickler.dump([getattr(self, name) for name in self._snapshot_attributes])
+        return buffer.getvalue()
+
+    def restore(self, blob: bytes):
+        """
+        Continue from the state serialized by snapshot.
+        """
+        unpickler = pickle.Unpickler(io.BytesIO(blob))
+        unpickler.persistent_load = self.plan.sibling_variables.__getitem__
+        formulae, window_mode = unpickler.load()
+        assert formulae == self.plan.formulae and window_mode == self.window_mode, \
+            "Snapshot of {} cannot be restored for {}".format(", ".join(str(formula) for formula in formulae),
+                                                              ", ".join(str(formula) for formula in self.plan.formulae))
+        for name, value in zip(self._snapshot_attributes, unpickler.load()):
+            setattr(self, name, value)
 
     def _debug(self):
         if not self.debug_mode:
@@ -248,9 +456,7 @@ class Monitor:
         print("Character: {}".format(self.current_character))
 
         print("History:")
-        for entry in self.history:
-            time_information, b_expr = entry
-            print(time_information, str(b_expr))
+        self._print_history()
 
         print("Current formulae:")
         for k in range(self.N):
@@ -266,37 +472,81 @@ class Monitor:
 
         print("")
 
-    def run(self, pattern: List[Tuple[int, str]]) -> bool:
+    def _pending_histories(self) -> List[Dict[BE.BooleanExpression, Tuple[int, int]]]:
+        return [self.history]
+
+    def _resolved_verdicts(self,
+                           formula_verdicts: Set[Tuple[Tuple[int, int], BE.BooleanExpression]]) -> List[Set[Tuple[Tuple[int, int], BE.BooleanExpression]]]:
+        return [formula_verdicts]
+
+    def _print_history(self):
+        for b_expr, time_information in self.history.items():
+            print(time_information, str(b_expr))
+
+    def iter_verdicts(self, events: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, int, bool]]:
+        """
+        Lazily monitor a (possibly unbounded) stream of events, continuing from the current state of the monitor.
+        (timestamp, offset, verdict) tuples are yielded as soon as the verdicts are resolved; verdicts resolved by the
+        same event are yielded in the order of their timestamps and offsets. Events (timestamp, None) are heartbeats,
+        see advance_time.
+        """
+        for timestamp, character in events:
+            if character is None:
+                formula_verdicts = self.advance_time(timestamp)
+            else:
+                self._debug()
+                formula_verdicts = self.step(timestamp, character)
+
+            for ((verdict_timestamp, offset), b_expr) in sorted(formula_verdicts, key=itemgetter(0)):
+                yield verdict_timestamp, offset, b_expr is BE.TRUE
+
+    def feed(self,
+             events: Iterable[Tuple[int, str]],
+             sink: Callable[[int, int, bool], None]):
+        """
+        Monitor a stream of events and pass every resolved verdict to the sink as (timestamp, offset, verdict).
+        """
+        for timestamp, offset, verdict in self.iter_verdicts(events):
+            sink(timestamp, offset, verdict)
+
+    def evaluate(self, pattern: Iterable[Tuple[int, str]]) -> 'MonitorResult':
+        """
+        Monitor a trace from the initial state without printing and return its verdicts and whether it satisfies the
+        formula.
+        """
         self._reset()
+        verdicts = list(self.iter_verdicts(pattern))
+        return MonitorResult(verdicts, self._backtrack_for_final_solution())
 
-        for timestamp, char in pattern:
-            self._debug()
-            formula_verdicts = self.step(timestamp, char)
+    def run(self, pattern: Iterable[Tuple[int, str]]) -> bool:
+        self._reset()
 
-            for ((timestamp, offset), b_expr) in formula_verdicts:
-                print("Verdict at timestamp {}: {}".format(timestamp, b_expr))
+        for timestamp, offset, verdict in self.iter_verdicts(pattern):
+            print("Verdict at timestamp {}: {}".format(timestamp, "TRUE" if verdict else "FALSE"))
 
         self._debug()
         return self._backtrack_for_final_solution()
 
-    def _backtrack_for_final_solution(self):
+    def _backtrack_for_final_solution(self, formula_idx: int = -1):
         """
-        Check validity of the formula that is being monitored.
+        Check validity of the formula that is being monitored, i.e. of the sub-formula at formula_idx.
         """
 
         # probably unnecessary simplification of boolean expression for the final formula
-        expression = self.previous[-1].simplify()
+        expression = self.previous[formula_idx].simplify()
 
         # while the boolean expression is pointing at a sub-formula, access it
         # again probably unnecessary simplification of boolean expression
+        negated = False
         while isinstance(expression, BE.VarExpression) or isinstance(expression, BE.NegVarExpression):
+            negated ^= isinstance(expression, BE.NegVarExpression)
             expression = self.previous[expression.var].simplify()
 
         # final case reached: output a boolean
         if isinstance(expression, BE.TrueBooleanExpression):
-            out = True
+            out = not negated
         elif isinstance(expression, BE.FalseBooleanExpression):
-            out = False
+            out = negated
         else:
             # we have a conjunction or disjunction at the end. but it did not get resolved.
             print("Error in back-tracking for final solution. Returning False.")
@@ -304,6 +554,23 @@ class Monitor:
 
         return out
 
+
+def _update_propositional_slots(values: list, old_mask: int, new_mask: int, true, false, changed_steps: array,
+                                step: int):
+    """
+    Update the propositional slots of the values array from the bitmask old_mask to new_mask. Only the slots whose bits
+    differ are written and marked as changed in the step, slots of propositions which do not match either event keep
+    their shared False value.
+    """
+    changed = old_mask ^ new_mask
+    while changed:
+        lowest = changed & -changed
+        k = lowest.bit_length() - 1
+        values[k] = true if new_mask & lowest else false
+        changed_steps[k] = step
+        changed ^= lowest
+
+
 def main():
     pattern = test_cases.pattern_aaabb()
     formula = test_cases.conjunction()
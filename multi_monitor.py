@@ -0,0 +1,180 @@
+import formula as F
+import boolean_expression as BE
+
+from atoms import Character
+from compiler import compile_formulae, Plan
+from formula_parser import parse
+from metrics import MonitorMetrics
+from monitor import Monitor, MonitorResult
+
+import test_cases
+
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+
+class MultiMonitor(Monitor):
+    """
+    Monitors several formulae over the same trace. All formulae are compiled into one plan in which equal
+    sub-formulae share their slot (see Plan), so a sub-formula which occurs in many properties is only evaluated once
+    per event. Each formula keeps its own history of pending verdicts.
+
+    Verdicts are reported with the index of their formula in the sequence of formulae.
+    """
+    _snapshot_attributes = Monitor._snapshot_attributes + ('histories',)
+
+    def __init__(self,
+                 formulae: Sequence[Union[F.Formula, str]],
+                 debug_mode: Optional[bool] = False,
+                 window_mode: Optional[bool] = False,
+                 metrics: Optional[MonitorMetrics] = None,
+                 bdd_mode: Optional[bool] = False):
+        self.formulae = tuple(parse(formula) if isinstance(formula, str) else formula for formula in formulae)
+        assert self.formulae, "No formulae to monitor"
+        super().__init__(self.formulae[0], debug_mode=debug_mode, window_mode=window_mode, metrics=metrics,
+                         bdd_mode=bdd_mode)
+
+    def _reset(self):
+        super()._reset()
+        self.roots = self.plan.roots
+        self.histories = [{} for _ in self.roots]
+
+    def _compile(self) -> Plan:
+        return compile_formulae(self.formulae, self.window_mode)
+
+    def step(self, timestamp: int, character: Character) -> List[Set[Tuple[Tuple[int, int], BE.BooleanExpression]]]:
+        """
+        Process an event and return the resolved verdicts of every formula.
+        """
+        formula_verdicts = [set() for _ in self.roots]
+        self._step(timestamp, character, self.plan.propositional_mask(character), formula_verdicts)
+        return formula_verdicts
+
+    def advance_time(self, timestamp: int) -> List[Set[Tuple[Tuple[int, int], BE.BooleanExpression]]]:
+        """
+        Heartbeat (see Monitor.advance_time), returns the resolved verdicts of every formula.
+        """
+        formula_verdicts = [set() for _ in self.roots]
+        self._advance(timestamp, formula_verdicts)
+        return formula_verdicts
+
+    def step_many(self,
+                  timestamps: Sequence[int],
+                  characters: Sequence,
+                  symbols: Optional[Sequence[str]] = None) -> List[Tuple[int, int, int, bool]]:
+        """
+        Process a chunk of events (see Monitor.step_many).
+        Returns the (formula index, timestamp, offset, verdict) tuples resolved by the whole chunk in the order of
+        iter_verdicts.
+        """
+        assert len(timestamps) == len(characters), "Got {} timestamps for {} characters".format(len(timestamps),
+                                                                                                 len(characters))
+        symbol_masks = None if symbols is None else self.plan.symbol_masks(symbols)
+        propositional_mask = self.plan.propositional_mask
+        step = self._step
+
+        verdicts = []
+        formula_verdicts = [set() for _ in self.roots]
+        for timestamp, character in zip(timestamps, characters):
+            if symbol_masks is None:
+                step(timestamp, character, propositional_mask(character), formula_verdicts)
+            else:
+                step(timestamp, symbols[character], symbol_masks[character], formula_verdicts)
+
+            for formula_idx, resolved in enumerate(formula_verdicts):
+                if resolved:
+                    for ((verdict_timestamp, offset), b_expr) in sorted(resolved, key=itemgetter(0)):
+                        verdicts.append((formula_idx, verdict_timestamp, offset, b_expr is BE.TRUE))
+                    resolved.clear()
+
+        return verdicts
+
+    def _update_history(self,
+                        delta_t: int,
+                        formula_verdicts: List[Set[Tuple[Tuple[int, int], BE.BooleanExpression]]]):
+        # expressions are substituted against the shared arrays, so the substitutions are shared by all formulae
+        time_info = (self.current_timestamp, self.current_timestamp_offset)
+        substitutions = {}
+        diagrams = {} if self.bdd_mode else None
+        histories = []
+        for formula_idx, (root, pending, verdicts) in enumerate(zip(self.roots, self.histories, formula_verdicts)):
+            history = {}
+            if formula_idx not in self.resolved_formulae:
+                self.filter_verdict(history, verdicts, time_info, self.canonical_verdict(self.previous[root], diagrams))
+            for b_expr, verdict_time_info in pending.items():
+                b_expr = self.substitute_boolean_expression(b_expr, delta_t, substitutions)
+                self.filter_verdict(history, verdicts, verdict_time_info, self.canonical_verdict(b_expr, diagrams))
+            histories.append(history)
+        self.histories = histories
+        if self.resolved_formulae:
+            self.resolved_formulae = set()
+
+    def _pending_histories(self) -> List[Dict[BE.BooleanExpression, Tuple[int, int]]]:
+        return self.histories
+
+    def _resolved_verdicts(self,
+                           formula_verdicts: List[Set[Tuple[Tuple[int, int], BE.BooleanExpression]]]) -> List[Set[Tuple[Tuple[int, int], BE.BooleanExpression]]]:
+        return formula_verdicts
+
+    def _print_history(self):
+        for formula_idx, history in enumerate(self.histories):
+            for b_expr, time_information in history.items():
+                print(formula_idx, time_information, str(b_expr))
+
+    def iter_verdicts(self, events: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, int, int, bool]]:
+        """
+        Lazily monitor a stream of events (see Monitor.iter_verdicts) and yield (formula index, timestamp, offset,
+        verdict) tuples. Verdicts resolved by the same event are yielded by formula, then by timestamp and offset.
+        """
+        for timestamp, character in events:
+            if character is None:
+                resolved = self.advance_time(timestamp)
+            else:
+                self._debug()
+                resolved = self.step(timestamp, character)
+            for formula_idx, formula_verdicts in enumerate(resolved):
+                for ((verdict_timestamp, offset), b_expr) in sorted(formula_verdicts, key=itemgetter(0)):
+                    yield formula_idx, verdict_timestamp, offset, b_expr is BE.TRUE
+
+    def feed(self,
+             events: Iterable[Tuple[int, str]],
+             sink: Callable[[int, int, int, bool], None]):
+        """
+        Monitor a stream of events and pass every resolved verdict to the sink as (formula index, timestamp, offset,
+        verdict).
+        """
+        for formula_idx, timestamp, offset, verdict in self.iter_verdicts(events):
+            sink(formula_idx, timestamp, offset, verdict)
+
+    def evaluate(self, pattern: Iterable[Tuple[int, str]]) -> MonitorResult:
+        """
+        Monitor a trace from the initial state without printing and return its (formula index, timestamp, offset,
+        verdict) tuples and whether it satisfies every formula, in the order of the formulae.
+        """
+        self._reset()
+        verdicts = list(self.iter_verdicts(pattern))
+        return MonitorResult(verdicts, [self._backtrack_for_final_solution(root) for root in self.roots])
+
+    def run(self, pattern: Iterable[Tuple[int, str]]) -> List[bool]:
+        self._reset()
+
+        for formula_idx, timestamp, offset, verdict in self.iter_verdicts(pattern):
+            print("Verdict of formula {} at timestamp {}: {}".format(formula_idx, timestamp,
+                                                                     "TRUE" if verdict else "FALSE"))
+
+        self._debug()
+        return [self._backtrack_for_final_solution(root) for root in self.roots]
+
+
+def main():
+    pattern = test_cases.pattern_aaabb()
+    formulae = [test_cases.conjunction(), test_cases.until(), test_cases.next(), test_cases.previous()]
+
+    print("Running formulae {} on pattern {} ".format(", ".join(str(formula) for formula in formulae), pattern))
+    monitor = MultiMonitor(formulae)
+    print("Monitoring {} formulae with {} sub-formulae".format(len(formulae), monitor.N))
+    print("Trace satisfies formulae: {}\n".format(monitor.run(pattern)))
+
+
+if __name__ == '__main__':
+    main()
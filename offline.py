@@ -0,0 +1,130 @@
+import formula as F
+
+import numpy as np
+
+from typing import List, Optional, Sequence, Tuple
+
+
+def _next_true(mask: np.ndarray) -> np.ndarray:
+    """
+    Index of the first position at or after every position where the mask holds, len(mask) if there is none.
+    """
+    n = len(mask)
+    indices = np.where(mask, np.arange(n), n)
+    return np.minimum.accumulate(indices[::-1])[::-1]
+
+
+def _last_true(mask: np.ndarray) -> np.ndarray:
+    """
+    Index of the last position at or before every position where the mask holds, -1 if there is none.
+    """
+    return np.maximum.accumulate(np.where(mask, np.arange(len(mask)), -1))
+
+
+class OfflineMonitor:
+    """
+    Evaluates a formula over a complete trace at once. Every sub-formula is evaluated bottom-up into a boolean array
+    over the positions of the trace, future operators with a backward pass, intervals by searching the sorted
+    timestamps.
+
+    The verdicts are those of a Monitor in either mode: UNTIL, NEXT and PREVIOUS follow the intervals of Monitor, e.g.
+    the lower bound of an UNTIL has to be reached by the first time distance, and SINCE follows the usual MTL semantics.
+    Future operators do not hold at the last position, whose verdict Monitor never resolves.
+    """
+    def __init__(self, formula: F.Formula):
+        self.formula = formula
+
+    def evaluate(self,
+                 timestamps: Sequence[int],
+                 characters: Sequence,
+                 symbols: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Verdicts of the formula at every position of a trace given as timestamps and characters, or as codes into the
+        symbol table (e.g. the columns of a TraceFile).
+        """
+        self.timestamps = np.array(timestamps, dtype=np.int64)
+        if symbols is None:
+            symbols, codes = np.unique(np.asarray(characters, dtype=str), return_inverse=True)
+        else:
+            codes = characters
+        self.symbol_ids = {symbol: code for code, symbol in enumerate(symbols)}
+        self.codes = np.array(codes, dtype=np.int64).reshape(-1)
+
+        # time distance from every position to the next one
+        self.delta_t = np.diff(self.timestamps)
+        self.values = {}
+        return self._evaluate(self.formula)
+
+    def verdicts(self, trace: Sequence[Tuple[int, str]]) -> List[Tuple[int, int, bool]]:
+        """
+        (timestamp, offset, verdict) tuples of every position of a trace of (timestamp, character) events.
+        """
+        if not trace:
+            return []
+        timestamps, characters = zip(*trace)
+        values = self.evaluate(timestamps, characters)
+
+        verdicts = []
+        offset = 0
+        for k, (timestamp, value) in enumerate(zip(timestamps, values.tolist())):
+            offset = offset + 1 if k > 0 and timestamp == timestamps[k - 1] else 0
+            verdicts.append((timestamp, offset, value))
+        return verdicts
+
+    def _evaluate(self, formula: F.Formula) -> np.ndarray:
+        values = self.values.get(formula)
+        if values is None:
+            values = self.values[formula] = self._evaluate_operator(formula)
+        return values
+
+    def _evaluate_operator(self, formula: F.Formula) -> np.ndarray:
+        n = len(self.codes)
+        timestamps = self.timestamps
+        delta_t = self.delta_t
+
+        if isinstance(formula, F.Proposition):
+            code = self.symbol_ids.get(formula.character)
+            return self.codes == code if code is not None else np.zeros(n, dtype=bool)
+
+        elif isinstance(formula, F.Negation):
+            return ~self._evaluate(formula.formula)
+
+        elif isinstance(formula, F.Conjunction):
+            # NOTE: Conjunction is the disjunction of its operands, see the monitor
+            return self._evaluate(formula.formula1) | self._evaluate(formula.formula2)
+
+        begin, end = formula.interval.begin, formula.interval.end
+        values = np.zeros(n, dtype=bool)
+
+        if isinstance(formula, F.Next):
+            values[:-1] = self._evaluate(formula.formula)[1:] & (begin <= delta_t) & (delta_t <= end)
+
+        elif isinstance(formula, F.Previous):
+            values[1:] = self._evaluate(formula.formula)[:-1] & (begin <= delta_t) & (delta_t <= end)
+
+        elif isinstance(formula, F.Until):
+            # formula 2 holds at a later position j within the upper bound, formula 1 at every position from here to j
+            # and the lower bound is reached by the time distance to the next position
+            formula_1 = self._evaluate(formula.formula1)
+            formula_2 = self._evaluate(formula.formula2)
+            next_formula_2 = _next_true(formula_2)
+            next_failure_1 = _next_true(~formula_1)
+            last_in_interval = np.searchsorted(timestamps, timestamps + end, side='right') - 1
+            values[:-1] = (formula_1[:-1] & (delta_t >= begin)
+                           & (next_formula_2[1:] <= np.minimum(next_failure_1[1:], last_in_interval[:-1])))
+            if begin == 0:
+                values |= formula_2
+
+        elif isinstance(formula, F.Since):
+            # formula 2 held at a position j inside the interval, formula 1 at every position after j
+            formula_1 = self._evaluate(formula.formula1)
+            formula_2 = self._evaluate(formula.formula2)
+            first = np.maximum(_last_true(~formula_1), np.searchsorted(timestamps, timestamps - end, side='left'))
+            last = np.minimum(np.searchsorted(timestamps, timestamps - begin, side='right') - 1, np.arange(n))
+            counts = np.concatenate(([0], np.cumsum(formula_2)))
+            values[:] = (first <= last) & (counts[last + 1] > counts[first])
+
+        else:
+            raise NotImplementedError("Cannot evaluate formula {}".format(formula))
+
+        return values
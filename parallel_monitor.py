@@ -0,0 +1,108 @@
+import formula as F
+
+from monitor import Monitor, MonitorResult
+from parametric_monitor import ParametricMonitor
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from heapq import merge
+from itertools import islice
+from operator import itemgetter
+from typing import Hashable, Iterable, Iterator, List, Optional, Tuple
+
+# monitor of the worker process, created once per worker by _initialize_worker
+_worker_monitor = None
+
+
+def _initialize_worker(formula: F.Formula,
+                       window_mode: bool,
+                       keyed: bool = False,
+                       ttl: Optional[int] = None,
+                       max_keys: Optional[int] = None):
+    global _worker_monitor
+    if keyed:
+        _worker_monitor = ParametricMonitor(formula, window_mode=window_mode, ttl=ttl, max_keys=max_keys)
+    else:
+        _worker_monitor = Monitor(formula, window_mode=window_mode)
+
+
+def _evaluate_trace(trace: List[Tuple[int, str]]) -> MonitorResult:
+    return _worker_monitor.evaluate(trace)
+
+
+def _step_shard(events: List[Tuple[Hashable, int, str]]) -> List[Tuple[Hashable, int, int, bool]]:
+    # the verdicts of different keys are resolved in the order of the events, not of their timestamps, so they are
+    # sorted for the merge of the shards
+    return sorted(_worker_monitor.iter_verdicts(events), key=itemgetter(1, 2))
+
+
+class ParallelMonitor:
+    """
+    Monitors a formula on several processes. The formula is sent to every worker process once, when the worker is
+    started, and only events and verdicts are exchanged afterwards.
+
+    1. run_traces monitors independent traces on a pool of max_workers processes.
+    2. iter_verdicts monitors a stream of keyed events (see ParametricMonitor) on a number of shards. The keys are
+       partitioned by their hash, every shard is a process of its own and keeps the state of its keys.
+    """
+    def __init__(self,
+                 formula: F.Formula,
+                 window_mode: Optional[bool] = False,
+                 max_workers: Optional[int] = None):
+        self.formula = formula
+        self.window_mode = window_mode
+        self.max_workers = max_workers
+
+    def run_traces(self,
+                   traces: Iterable[List[Tuple[int, str]]],
+                   chunksize: int = 1) -> Iterator[MonitorResult]:
+        """
+        Monitor every trace from the initial state and yield their results in the order of the traces. chunksize
+        traces are sent to a worker at once.
+        """
+        with ProcessPoolExecutor(self.max_workers, initializer=_initialize_worker,
+                                 initargs=(self.formula, self.window_mode)) as executor:
+            for result in executor.map(_evaluate_trace, traces, chunksize=chunksize):
+                yield result
+
+    def iter_verdicts(self,
+                      events: Iterable[Tuple[Hashable, int, str]],
+                      shards: Optional[int] = None,
+                      chunk_size: int = 10000,
+                      ttl: Optional[int] = None,
+                      max_keys: Optional[int] = None) -> Iterator[Tuple[Hashable, int, int, bool]]:
+        """
+        Monitor a stream of (key, timestamp, character) events and yield (key, timestamp, offset, verdict) tuples.
+        The events are read in chunks of chunk_size events, which are split by shard, and the verdicts resolved by a
+        chunk are yielded in the order of their timestamps and offsets. The order only holds within a chunk: a verdict
+        which is resolved by a later chunk may be earlier than the verdicts of the preceding chunks. The next chunk is
+        monitored while the verdicts of the previous one are consumed. ttl and max_keys bound the keys of every shard
+        (see ParametricMonitor).
+        """
+        shards = shards or self.max_workers or 1
+        executors = [ProcessPoolExecutor(1, initializer=_initialize_worker,
+                                         initargs=(self.formula, self.window_mode, True, ttl, max_keys))
+                     for _ in range(shards)]
+        try:
+            events = iter(events)
+            pending = deque()
+            while True:
+                chunk = list(islice(events, chunk_size))
+                if chunk:
+                    partitions = [[] for _ in range(shards)]
+                    for event in chunk:
+                        partitions[hash(event[0]) % shards].append(event)
+                    pending.append([executor.submit(_step_shard, partition)
+                                    for executor, partition in zip(executors, partitions) if partition])
+                elif not pending:
+                    break
+
+                # keep one chunk in flight while the verdicts of the previous one are merged
+                if chunk and len(pending) < 2:
+                    continue
+
+                for verdict in merge(*[future.result() for future in pending.popleft()], key=itemgetter(1, 2)):
+                    yield verdict
+        finally:
+            for executor in executors:
+                executor.shutdown()
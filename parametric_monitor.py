@@ -0,0 +1,146 @@
+import formula as F
+import boolean_expression as BE
+
+from atoms import Character
+from compiler import compile_formula, Plan
+from formula_parser import compile_text, normalize, parse
+from monitor import Monitor
+
+from collections import OrderedDict
+from operator import itemgetter
+from typing import Callable, Hashable, Iterable, Iterator, Optional, Set, Tuple, Union
+
+
+def _plan_attribute(name: str) -> property:
+    return property(lambda self: getattr(self.plan, name))
+
+
+class MonitorSlice(Monitor):
+    """
+    Monitor state of a single key of a ParametricMonitor. Slices share the compiled plan of their ParametricMonitor and
+    only keep the arrays, the pending verdicts and the time of the last event of their key.
+    """
+    debug_mode = False
+    metrics = None
+    bdd_mode = False
+
+    subformulae = _plan_attribute('subformulae')
+    formula_index = _plan_attribute('formula_index')
+    children = _plan_attribute('children')
+    siblings = _plan_attribute('siblings')
+    window_mode = _plan_attribute('window_mode')
+    N = _plan_attribute('N')
+
+    def __init__(self, plan: Plan):
+        self.plan = plan
+        self._reset()
+
+    @property
+    def formula(self) -> F.Formula:
+        return self.plan.formulae[0]
+
+    def _create_arrays(self):
+        self._initialize_arrays()
+
+
+class ParametricMonitor:
+    """
+    Monitors a formula separately for every key of a stream of (key, timestamp, character) events, e.g. per session or
+    request ID. Events are routed to the slice of their key, which is created on the first event of the key.
+
+    Idle keys are evicted to bound the memory:
+    1. keys whose last event is more than ttl time units older than the latest event are evicted when events arrive and
+    2. the least recently used keys are evicted when there are more than max_keys keys.
+    The pending verdicts of an evicted key are dropped; on_evict is called with the key and its slice before.
+    The least recently used keys are checked for expiry first, so with timestamps which are not increasing across keys,
+    a key may outlive its ttl until the keys used before it have expired.
+    """
+    def __init__(self,
+                 formula: Union[F.Formula, str],
+                 window_mode: Optional[bool] = False,
+                 ttl: Optional[int] = None,
+                 max_keys: Optional[int] = None,
+                 on_evict: Optional[Callable[[Hashable, MonitorSlice], None]] = None):
+        assert max_keys is None or max_keys > 0, "Invalid maximum number of keys {}".format(max_keys)
+        self.window_mode = window_mode
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.on_evict = on_evict
+        if isinstance(formula, str):
+            # the text is parsed first, so that errors are reported against it, the parsed formula is cached
+            parse(formula)
+            self.plan = compile_text(normalize(formula), window_mode)
+        else:
+            self.plan = compile_formula(formula, window_mode)
+        self.formula = self.plan.formulae[0]
+        self._reset()
+
+    def _reset(self):
+        # slices in the order of their last use, the least recently used first
+        self.slices = OrderedDict()
+        self.latest_timestamp = None
+        self.counters = {'events': 0, 'keys_created': 0, 'keys_expired': 0, 'keys_evicted': 0}
+
+    def __len__(self) -> int:
+        return len(self.slices)
+
+    def step(self,
+             key: Hashable,
+             timestamp: int,
+             character: Character) -> Set[Tuple[Tuple[int, int], BE.BooleanExpression]]:
+        """
+        Process an event of a key and return the verdicts resolved for the key (see Monitor.step).
+        """
+        self.counters['events'] += 1
+        if self.latest_timestamp is None or timestamp > self.latest_timestamp:
+            self.latest_timestamp = timestamp
+            if self.ttl is not None:
+                self.expire(timestamp - self.ttl)
+
+        monitor_slice = self.slices.get(key)
+        if monitor_slice is None:
+            monitor_slice = self.slices[key] = MonitorSlice(self.plan)
+            self.counters['keys_created'] += 1
+            if self.max_keys is not None and len(self.slices) > self.max_keys:
+                self._evict(next(iter(self.slices)), 'keys_evicted')
+        else:
+            self.slices.move_to_end(key)
+
+        return monitor_slice.step(timestamp, character)
+
+    def expire(self, timestamp: int):
+        """
+        Evict the keys whose last event is older than the timestamp.
+        """
+        while self.slices:
+            key, monitor_slice = next(iter(self.slices.items()))
+            if monitor_slice.current_timestamp >= timestamp:
+                break
+            self._evict(key, 'keys_expired')
+
+    def _evict(self, key: Hashable, counter: str):
+        monitor_slice = self.slices.pop(key)
+        self.counters[counter] += 1
+        if self.on_evict is not None:
+            self.on_evict(key, monitor_slice)
+
+    def iter_verdicts(self, events: Iterable[Tuple[Hashable, int, str]]) -> Iterator[Tuple[Hashable, int, int, bool]]:
+        """
+        Lazily monitor a stream of keyed events and yield (key, timestamp, offset, verdict) tuples as soon as the
+        verdicts are resolved (see Monitor.iter_verdicts).
+        """
+        for key, timestamp, character in events:
+            formula_verdicts = self.step(key, timestamp, character)
+
+            for ((verdict_timestamp, offset), b_expr) in sorted(formula_verdicts, key=itemgetter(0)):
+                yield key, verdict_timestamp, offset, b_expr is BE.TRUE
+
+    def feed(self,
+             events: Iterable[Tuple[Hashable, int, str]],
+             sink: Callable[[Hashable, int, int, bool], None]):
+        """
+        Monitor a stream of keyed events and pass every resolved verdict to the sink as (key, timestamp, offset,
+        verdict).
+        """
+        for key, timestamp, offset, verdict in self.iter_verdicts(events):
+            sink(key, timestamp, offset, verdict)
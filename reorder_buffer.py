@@ -0,0 +1,150 @@
+from metrics import Histogram
+from monitor import Monitor
+
+import heapq
+import time
+
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+LATE_POLICIES = ('drop', 'adjust', 'raise')
+
+
+class ReorderBuffer:
+    """
+    Ingestion stage in front of a monitor (or multi monitor) for events which arrive slightly out of order, e.g. from
+    several producers. Events are buffered in a heap on (timestamp, arrival order) and released to the monitor in order
+    once the watermark has passed them.
+
+    The watermark is the latest timestamp seen minus max_lateness, i.e. events may arrive up to max_lateness time units
+    after later events. Events behind the watermark are late and handled by the late policy:
+    1. drop: the event is dropped,
+    2. adjust: the event is monitored at the timestamp of the watermark or
+    3. raise: a ValueError is raised.
+    on_late is called with every late event before. If the buffer holds more than max_size events, its earliest event
+    is released early and the watermark is raised to its timestamp.
+
+    After releasing events, the time of the monitor is advanced to the watermark (see Monitor.advance_time), so pending
+    verdicts are resolved while the buffer waits for further events.
+
+    Counters: events, released, late, dropped, adjusted and forced (released early because of max_size).
+    Histograms: occupancy of the buffer after every arrival and latency_us, the wall time between the arrival and the
+    release of an event.
+    """
+    def __init__(self,
+                 monitor: Monitor,
+                 max_lateness: int,
+                 max_size: Optional[int] = None,
+                 late_policy: str = 'drop',
+                 on_late: Optional[Callable[[int, str], None]] = None):
+        assert max_lateness >= 0, "Invalid lateness bound {}".format(max_lateness)
+        assert max_size is None or max_size > 0, "Invalid buffer size {}".format(max_size)
+        assert late_policy in LATE_POLICIES, "Unknown late policy {}".format(late_policy)
+        self.monitor = monitor
+        self.max_lateness = max_lateness
+        self.max_size = max_size
+        self.late_policy = late_policy
+        self.on_late = on_late
+        self._reset()
+
+    def _reset(self):
+        # (timestamp, arrival order, character, arrival time) of the buffered events
+        self.heap = []
+        self.arrivals = 0
+        self.latest_timestamp = None
+        self.watermark = None
+        self.released_timestamp = None
+        self.counters = {'events': 0, 'released': 0, 'late': 0, 'dropped': 0, 'adjusted': 0, 'forced': 0}
+        self.histograms = {'occupancy': Histogram(), 'latency_us': Histogram()}
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def push(self, timestamp: int, character: Optional[str]) -> List[Tuple]:
+        """
+        Add an event and return the verdicts resolved by the events it releases, in the format of the iter_verdicts of
+        the monitor. Events (timestamp, None) are heartbeats, see advance_time.
+        """
+        if character is None:
+            return self.advance_time(timestamp)
+
+        self.counters['events'] += 1
+        if self.watermark is not None and timestamp < self.watermark:
+            self.counters['late'] += 1
+            if self.on_late is not None:
+                self.on_late(timestamp, character)
+
+            if self.late_policy == 'raise':
+                raise ValueError("Event at {} behind the watermark {}".format(timestamp, self.watermark))
+            elif self.late_policy == 'drop':
+                self.counters['dropped'] += 1
+                return []
+            self.counters['adjusted'] += 1
+            timestamp = self.watermark
+
+        heapq.heappush(self.heap, (timestamp, self.arrivals, character, time.perf_counter()))
+        self.arrivals += 1
+        self.histograms['occupancy'].observe(len(self.heap))
+        return self._release(timestamp)
+
+    def advance_time(self, timestamp: int) -> List[Tuple]:
+        """
+        Heartbeat of the producers: the time has reached the timestamp, so the watermark follows it even without events.
+        """
+        return self._release(timestamp)
+
+    def flush(self) -> List[Tuple]:
+        """
+        Release all buffered events, e.g. at the end of the stream.
+        """
+        events = []
+        while self.heap:
+            events.append(self._pop())
+        return self._monitor(events)
+
+    def _release(self, timestamp: int) -> List[Tuple]:
+        if self.latest_timestamp is None or timestamp > self.latest_timestamp:
+            self.latest_timestamp = timestamp
+            if self.watermark is None or timestamp - self.max_lateness > self.watermark:
+                self.watermark = timestamp - self.max_lateness
+
+        heap = self.heap
+        events = []
+        while heap and heap[0][0] < self.watermark:
+            events.append(self._pop())
+        if self.max_size is not None:
+            while len(heap) > self.max_size:
+                self.counters['forced'] += 1
+                events.append(self._pop())
+                self.watermark = self.released_timestamp
+
+        if self.released_timestamp is not None and self.watermark > self.released_timestamp:
+            # no further event will be released before the watermark
+            events.append((self.watermark, None))
+        return self._monitor(events)
+
+    def _pop(self) -> Tuple[int, str]:
+        timestamp, _, character, arrival = heapq.heappop(self.heap)
+        self.histograms['latency_us'].observe(1e6 * (time.perf_counter() - arrival))
+        self.counters['released'] += 1
+        self.released_timestamp = timestamp
+        return timestamp, character
+
+    def _monitor(self, events: List[Tuple[int, Optional[str]]]) -> List[Tuple]:
+        if not events:
+            return []
+        return list(self.monitor.iter_verdicts(events))
+
+    def iter_verdicts(self, events: Iterable[Tuple[int, Optional[str]]]) -> Iterator[Tuple]:
+        """
+        Lazily monitor a stream of events which may arrive out of order and yield the verdicts as soon as they are
+        resolved. The buffer is flushed at the end of the stream.
+        """
+        for timestamp, character in events:
+            for verdict in self.push(timestamp, character):
+                yield verdict
+        for verdict in self.flush():
+            yield verdict
+
+    def export(self) -> Dict:
+        return {'counters': dict(self.counters),
+                'histograms': {name: histogram.export() for name, histogram in self.histograms.items()}}
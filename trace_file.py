@@ -0,0 +1,175 @@
+from monitor import Monitor
+
+import argparse
+import csv
+import json
+import mmap
+import struct
+import sys
+
+from array import array
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# binary trace format, all numbers are little-endian:
+# 1. header: magic, number of events (uint64), number of symbols (uint32), size of the symbol dictionary (uint32)
+# 2. symbol dictionary: the UTF-8 encoded symbols, each prefixed by its length (uint32), padded to 8 bytes
+# 3. timestamps (int64 per event)
+# 4. symbol IDs, i.e. indices into the symbol dictionary (uint32 per event)
+MAGIC = b'RMTRACE1'
+HEADER = struct.Struct('<8sQII')
+SYMBOL_LENGTH = struct.Struct('<I')
+
+
+def _column(buffer: memoryview, typecode: str) -> Sequence[int]:
+    # the columns are cast in place on little-endian machines and copied otherwise
+    if sys.byteorder == 'little':
+        return buffer.cast(typecode)
+
+    column = array(typecode, buffer.tobytes())
+    column.byteswap()
+    return column
+
+
+class TraceFile:
+    """
+    Memory-mapped binary trace. The timestamps and symbol IDs are read directly from the mapped file, so traces are
+    monitored in chunks without creating an object per event.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+
+        magic, self.length, symbol_count, dictionary_size = HEADER.unpack_from(self._buffer)
+        assert magic == MAGIC, "{} is not a binary trace".format(path)
+
+        self.symbols = []
+        position = HEADER.size
+        for _ in range(symbol_count):
+            symbol_length, = SYMBOL_LENGTH.unpack_from(self._buffer, position)
+            position += SYMBOL_LENGTH.size
+            self.symbols.append(bytes(self._buffer[position:position + symbol_length]).decode('utf-8'))
+            position += symbol_length
+
+        timestamps_begin = HEADER.size + dictionary_size
+        codes_begin = timestamps_begin + 8 * self.length
+        self.timestamps = _column(self._buffer[timestamps_begin:codes_begin], 'q')
+        self.codes = _column(self._buffer[codes_begin:codes_begin + 4 * self.length], 'I')
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __enter__(self) -> 'TraceFile':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self.timestamps, memoryview):
+            self.timestamps.release()
+            self.codes.release()
+        self._buffer.release()
+        self._mmap.close()
+
+    def events(self) -> Iterator[Tuple[int, str]]:
+        """
+        Iterate over the trace as (timestamp, character) tuples, e.g. for Monitor.run.
+        """
+        symbols = self.symbols
+        for timestamp, code in zip(self.timestamps, self.codes):
+            yield timestamp, symbols[code]
+
+    def chunks(self, chunk_size: int = 65536) -> Iterator[Tuple[Sequence[int], Sequence[int]]]:
+        """
+        Iterate over the trace as chunks of timestamps and symbol IDs, which are views of the mapped file and have to be
+        released before the file is closed.
+        """
+        for begin in range(0, self.length, chunk_size):
+            yield self.timestamps[begin:begin + chunk_size], self.codes[begin:begin + chunk_size]
+
+    def feed(self, monitor: Monitor, chunk_size: int = 65536) -> Iterator[Tuple[int, int, bool]]:
+        """
+        Monitor the trace in chunks, continuing from the current state of the monitor, and yield the verdicts in the
+        order of Monitor.step_many.
+        """
+        for timestamps, codes in self.chunks(chunk_size):
+            for verdict in monitor.step_many(timestamps, codes, self.symbols):
+                yield verdict
+
+
+def write_trace(path: str, events: Iterable[Tuple[int, str]], symbols: Optional[List[str]] = None):
+    """
+    Write (timestamp, character) events to a binary trace. Symbols are numbered in the order of their first
+    occurrence, after the given symbols.
+    """
+    symbols = list(symbols or [])
+    symbol_ids = {symbol: code for code, symbol in enumerate(symbols)}
+    timestamps = array('q')
+    codes = array('I')
+    for timestamp, symbol in events:
+        code = symbol_ids.get(symbol)
+        if code is None:
+            code = symbol_ids[symbol] = len(symbols)
+            symbols.append(symbol)
+        timestamps.append(timestamp)
+        codes.append(code)
+
+    dictionary = bytearray()
+    for symbol in symbols:
+        encoded = symbol.encode('utf-8')
+        dictionary += SYMBOL_LENGTH.pack(len(encoded)) + encoded
+    dictionary += bytes(-len(dictionary) % 8)
+
+    if sys.byteorder != 'little':
+        timestamps.byteswap()
+        codes.byteswap()
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(timestamps), len(symbols), len(dictionary)))
+        file.write(dictionary)
+        timestamps.tofile(file)
+        codes.tofile(file)
+
+
+def read_log(path: str,
+             timestamp_field: str = 'timestamp',
+             symbol_field: str = 'symbol') -> Iterator[Tuple[int, str]]:
+    """
+    Read (timestamp, character) events from a CSV log with a header row or from a JSON-lines log.
+    """
+    with open(path, newline='') as file:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(file):
+                yield int(row[timestamp_field]), row[symbol_field]
+        else:
+            for line in file:
+                if line.strip():
+                    event = json.loads(line)
+                    yield int(event[timestamp_field]), str(event[symbol_field])
+
+
+def convert(source: str,
+            target: str,
+            timestamp_field: str = 'timestamp',
+            symbol_field: str = 'symbol'):
+    """
+    Convert a CSV or JSON-lines log into a binary trace.
+    """
+    write_trace(target, read_log(source, timestamp_field, symbol_field))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a CSV (.csv) or JSON-lines log into a binary trace.")
+    parser.add_argument('source')
+    parser.add_argument('target')
+    parser.add_argument('--timestamp-field', default='timestamp')
+    parser.add_argument('--symbol-field', default='symbol')
+    arguments = parser.parse_args()
+
+    convert(arguments.source, arguments.target, arguments.timestamp_field, arguments.symbol_field)
+
+
+if __name__ == '__main__':
+    main()
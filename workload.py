@@ -0,0 +1,83 @@
+import formula as F
+
+import random
+
+from typing import List, Sequence, Tuple
+
+OPERATORS = ('negation', 'conjunction', 'next', 'previous', 'until', 'since')
+
+
+def symbol_names(alphabet_size: int) -> List[str]:
+    if alphabet_size <= 26:
+        return [chr(ord('a') + k) for k in range(alphabet_size)]
+    return ["e{}".format(k) for k in range(alphabet_size)]
+
+
+def generate_trace(length: int,
+                   alphabet_size: int = 2,
+                   rate: float = 1.0,
+                   burstiness: float = 0.0,
+                   equal_timestamps: float = 0.0,
+                   seed: int = 0) -> List[Tuple[int, str]]:
+    """
+    Random trace of (timestamp, character) events with uniformly drawn characters:
+    1. rate (at most 1) is the mean number of events per time unit, not counting events with equal timestamps,
+    2. burstiness is the probability that an event follows its predecessor after one time unit; the other time
+       distances are exponentially distributed, such that the mean rate is approximately kept, and
+    3. equal_timestamps is the probability that an event has the timestamp of its predecessor, i.e. the probability to
+       continue a run of events with increasing offsets.
+    """
+    assert 0 < rate <= 1, "Invalid rate {}".format(rate)
+    assert 0 <= burstiness < 1 and 0 <= equal_timestamps < 1, "Probabilities have to lie in [0, 1)"
+    rng = random.Random(seed)
+    symbols = symbol_names(alphabet_size)
+    mean_distance = (1 / rate - burstiness) / (1 - burstiness)
+
+    trace = []
+    timestamp = 0
+    for k in range(length):
+        if k > 0 and rng.random() >= equal_timestamps:
+            if rng.random() < burstiness:
+                timestamp += 1
+            else:
+                timestamp += max(1, round(rng.expovariate(1 / mean_distance)))
+        trace.append((timestamp, rng.choice(symbols)))
+    return trace
+
+
+def generate_formula(depth: int,
+                     max_bound: int = 5,
+                     alphabet_size: int = 2,
+                     operators: Sequence[str] = OPERATORS,
+                     seed: int = 0) -> F.Formula:
+    """
+    Random formula whose operators are drawn from the given ones, with nesting depth up to depth and intervals [b, e]
+    with 0 <= b <= e <= max_bound. The root is an operator unless depth is 0.
+    """
+    rng = random.Random(seed)
+    symbols = symbol_names(alphabet_size)
+
+    def interval():
+        end = rng.randint(0, max_bound)
+        return F.Interval(rng.randint(0, end), end)
+
+    def generate(level: int) -> F.Formula:
+        if level == 0 or (level < depth and rng.random() < 0.25):
+            return F.Proposition(character=rng.choice(symbols))
+
+        operator = rng.choice(operators)
+        if operator == 'negation':
+            return F.Negation(formula=generate(level - 1))
+        elif operator == 'conjunction':
+            return F.Conjunction(formula_1=generate(level - 1), formula_2=generate(level - 1))
+        elif operator == 'next':
+            return F.Next(formula=generate(level - 1), interval=interval())
+        elif operator == 'previous':
+            return F.Previous(formula=generate(level - 1), interval=interval())
+        elif operator == 'until':
+            return F.Until(formula1=generate(level - 1), formula2=generate(level - 1), interval=interval())
+        elif operator == 'since':
+            return F.Since(formula1=generate(level - 1), formula2=generate(level - 1), interval=interval())
+        raise NotImplementedError("Unknown operator {}".format(operator))
+
+    return generate(depth)